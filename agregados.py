@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Agregados precalculados sobre la tabla de hechos de BikeStore.
+
+@author: elias
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from datos import CARPETA_DATOS, VERSIONES_EN_MEMORIA, load_data
+from paralelo import mapear_particiones
+from periodos import dias_desde_fechas, rango_dias, rejilla_dia_categoria, ventas_por_periodo
+from ranking import TOP_VENDEDORES, codigos_nombres, sumar_por_nombre, top_k
+
+# Granularidad del cubo: día x categoría x vendedor x producto
+DIMENSIONES_CUBO = ["order_date", "category_id", "staff_id", "product_id"]
+
+
+# ============================================
+# CUBO DE VENTAS (DÍA x CATEGORÍA x VENDEDOR x PRODUCTO)
+# ============================================
+def _cubo_tramo(hechos):
+    return (
+        hechos
+        .groupby(DIMENSIONES_CUBO, sort=True)
+        .agg(total=("total", "sum"), quantity=("quantity", "sum"), ordenes=("order_id", "nunique"))
+        .reset_index()
+    )
+
+
+def cubo_desde_hechos(hechos):
+    # Una fila por combinación de claves con ventas; ordenado por fecha.
+    # Los tramos mensuales no comparten días, así que los cubos parciales solo se concatenan.
+    partes = mapear_particiones(_cubo_tramo, hechos)
+    return partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
+
+
+def nombres_desde_tablas(products, categories, staffs):
+    # Tablas id -> nombre para etiquetar los resultados del cubo, y códigos de nombre de
+    # productos y vendedores para los rankings
+    nombres = {
+        "categorias": pd.Series(
+            categories["category_name"].astype(str).to_numpy(), index=categories["category_id"], name="category_name"
+        ),
+        "productos": pd.Series(
+            products["product_name"].astype(str).to_numpy(), index=products["product_id"], name="product_name"
+        ),
+        "vendedores": pd.Series(
+            (staffs["first_name"].astype(str) + " " + staffs["last_name"].astype(str)).to_numpy(),
+            index=staffs["staff_id"],
+            name="staff_name",
+        ),
+    }
+    nombres["codigos_productos"] = codigos_nombres(nombres["productos"])
+    nombres["codigos_vendedores"] = codigos_nombres(nombres["vendedores"])
+    return nombres
+
+
+@st.cache_resource(max_entries=VERSIONES_EN_MEMORIA)
+def nombres_dimensiones(carpeta=CARPETA_DATOS, version=None):
+    products, order_items, orders, categories, staffs = load_data(carpeta, version)
+    return nombres_desde_tablas(products, categories, staffs)
+
+
+def filtrar_cubo(cubo, categoria_ids, fecha_ini, fecha_fin):
+    # Mismo criterio que aplicar_filtros(): rango de fechas por búsqueda binaria
+    ini = cubo["order_date"].searchsorted(pd.to_datetime(fecha_ini), side="left")
+    fin = cubo["order_date"].searchsorted(pd.to_datetime(fecha_fin), side="right")
+    cubo_filtrado = cubo.iloc[ini:fin]
+    return cubo_filtrado[cubo_filtrado["category_id"].isin(categoria_ids)]
+
+
+# ============================================
+# SUMAS ACUMULADAS DIARIAS POR CATEGORÍA
+# ============================================
+def acumulados_desde_cubo(cubo, previo=None, desde=None):
+    # acumulado[c, k] = ventas de la categoría c en los primeros k días del histórico,
+    # así el total de cualquier rango es una resta por categoría.
+    # Con `previo` y `desde` (ingesta incremental) se conservan las columnas anteriores
+    # a `desde` y solo se acumula la cola del cubo.
+    rejilla = rejilla_dia_categoria(cubo, previo, desde)
+    if not rejilla["incremental"]:
+        previo = None
+    k = rejilla["k"]
+    ancho = rejilla["num_dias"] - k
+    celda = rejilla["fila"] * ancho + (rejilla["dia"] - k)
+    forma = (len(rejilla["categoria_ids"]), ancho)
+
+    ventas = np.bincount(celda, weights=rejilla["cola"]["total"].to_numpy(), minlength=forma[0] * forma[1])
+    # Conteo de celdas con ventas (entero, exacto) para saber si una categoría vendió en el rango
+    celdas = np.bincount(celda, minlength=forma[0] * forma[1])
+    ventas = ventas.reshape(forma).cumsum(axis=1)
+    celdas = celdas.reshape(forma).cumsum(axis=1)
+
+    if previo is None:
+        base_ventas = np.zeros((forma[0], 1))
+        base_celdas = np.zeros((forma[0], 1), dtype=celdas.dtype)
+    else:
+        # Columnas 0..k del acumulado previo (repitiendo la última si hubo días sin ventas)
+        relleno = ((0, 0), (0, max(0, k + 1 - previo["ventas"].shape[1])))
+        base_ventas = np.pad(previo["ventas"], relleno, mode="edge")[:, :k + 1]
+        base_celdas = np.pad(previo["celdas"], relleno, mode="edge")[:, :k + 1]
+
+    return {
+        "inicio": rejilla["inicio"],
+        "categoria_ids": rejilla["categoria_ids"],
+        "ventas": np.hstack([base_ventas, ventas + base_ventas[:, -1:]]),
+        "celdas": np.hstack([base_celdas, celdas + base_celdas[:, -1:]]),
+    }
+
+
+def _columnas_rango(acumulados, fecha_ini, fecha_fin):
+    # Columnas [i, j] del acumulado que delimitan el rango de fechas
+    return rango_dias(acumulados["inicio"], acumulados["ventas"].shape[1] - 1, fecha_ini, fecha_fin)
+
+
+def ventas_categorias_rango(acumulados, categoria_ids, fecha_ini, fecha_fin):
+    # Ventas por category_id en [fecha_ini, fecha_fin] con dos lecturas por categoría
+    i, j = _columnas_rango(acumulados, fecha_ini, fecha_fin)
+
+    filas = np.flatnonzero(np.isin(acumulados["categoria_ids"], categoria_ids))
+    filas = filas[acumulados["celdas"][filas, j] > acumulados["celdas"][filas, i]]
+    ventas = acumulados["ventas"][filas, j] - acumulados["ventas"][filas, i]
+    return pd.Series(ventas, index=pd.Index(acumulados["categoria_ids"][filas], name="category_id"))
+
+
+def ventas_diarias_rango(acumulados, categoria_ids, fecha_ini, fecha_fin):
+    # Ventas por día (entero desde 1970-01-01) en [fecha_ini, fecha_fin] de las categorías
+    # elegidas: diferencias consecutivas del acumulado, solo los días con ventas
+    i, j = _columnas_rango(acumulados, fecha_ini, fecha_fin)
+    filas = np.isin(acumulados["categoria_ids"], categoria_ids)
+    ventas = np.diff(acumulados["ventas"][filas, i:j + 1].sum(axis=0))
+    con_ventas = np.flatnonzero(np.diff(acumulados["celdas"][filas, i:j + 1].sum(axis=0)))
+    dia_inicio = int(dias_desde_fechas(acumulados["inicio"]))
+    return pd.Series(
+        ventas[con_ventas], index=pd.Index(dia_inicio + i + con_ventas, name="dia"), name="total"
+    )
+
+
+# ============================================
+# RESULTADOS AGREGADOS DE UN FILTRO
+# ============================================
+def calcular_resultados(cubo, acumulados, nombres, categoria_ids, fecha_ini, fecha_fin):
+    # Ventas y series de las pestañas para un filtro dado. `ventas_productos` queda como
+    # ranking (sumas por código de nombre): el umbral de monto mínimo y el top K se aplican
+    # después con ranking.top_k. Los conteos van en distintos.py.
+    cubo_filtrado = filtrar_cubo(cubo, categoria_ids, fecha_ini, fecha_fin)
+    ventas_categoria_ids = ventas_categorias_rango(acumulados, categoria_ids, fecha_ini, fecha_fin)
+
+    ventas_categoria = ventas_categoria_ids.rename(index=nombres["categorias"]).rename_axis("category_name")
+    # Serie diaria del filtro: las demás granularidades se agregan desde ella
+    ventas_diarias = ventas_diarias_rango(acumulados, categoria_ids, fecha_ini, fecha_fin)
+
+    return {
+        "ventas_totales": float(ventas_categoria_ids.sum()),
+        "ventas_categoria": ventas_categoria.sort_values(ascending=False),
+        "ventas_diarias": ventas_diarias,
+        "ventas_mensuales": ventas_por_periodo(ventas_diarias, "mes"),
+        "ventas_productos": sumar_por_nombre(
+            nombres["codigos_productos"], cubo_filtrado["product_id"], cubo_filtrado["total"]
+        ),
+        "ventas_vendedores": top_k(
+            sumar_por_nombre(nombres["codigos_vendedores"], cubo_filtrado["staff_id"], cubo_filtrado["total"]),
+            TOP_VENDEDORES,
+        ),
+    }
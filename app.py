@@ -7,12 +7,30 @@ Created on Mon Nov 17 19:47:51 2025
 
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.ticker import FuncFormatter
-import numpy as np
 from datetime import datetime
 import io
 
+from datos import aplicar_filtros
+from agregados import calcular_resultados
+from distintos import calcular_conteos
+from ingesta import obtener_almacen
+from motor_sql import MOTOR_DATOS, obtener_motor_sql
+from cache_resultados import obtener_cache_resultados, clave_filtros
+from exportar import FORMATOS, descarga_diferida, nombre_archivo
+from inventario import (
+    VENTANA_DIAS, DIAS_RIESGO, DIAS_SOBRESTOCK, construir_inventario, version_inventario, ventana_ventas,
+    ventas_desde_hechos, evaluar_inventario,
+)
+from clientes import version_clientes, pedidos_desde_hechos, construir_base_clientes, calcular_rfm
+from cohortes import MEDIDAS, matriz_cohortes
+from periodos import GRANULARIDADES, ventas_por_periodo
+from ranking import TOP_PRODUCTOS, top_k
+from graficos import (
+    grafico_ventas_categoria, grafico_ventas_periodo, grafico_top_productos, grafico_top_vendedores,
+    grafico_ventas_segmento, obtener_cache_graficos,
+)
+import perfilador
+
 # ============================================
 # CONFIGURACIÓN GENERAL MEJORADA
 # ============================================
@@ -23,6 +41,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Tiempos por etapa de este rerun (solo si el perfilador está activado)
+perfilador.iniciar("app")
+
 # ============================================
 # CSS PERSONALIZADO
 # ============================================
@@ -53,36 +74,89 @@ st.markdown("""
 # ============================================
 # CARGA DE DATOS CON CACHE
 # ============================================
-@st.cache_data
-def load_data():
-    products = pd.read_csv("products.csv")
-    order_items = pd.read_csv("order_items.csv")
-    orders = pd.read_csv("orders.csv")
-    categories = pd.read_csv("categories.csv")
-    staffs = pd.read_csv("staffs.csv")
-    
-    # Arreglo de columnas duplicadas
-    order_items = order_items.rename(columns={"list_price": "list_price_order"})
-    products = products.rename(columns={"list_price": "list_price_product"})
-    
-    return products, order_items, orders, categories, staffs
+if MOTOR_DATOS == "pandas":
+    # Almacén compartido por el proceso: incorpora las órdenes nuevas de forma
+    # incremental y solo recarga todo si cambian las dimensiones
+    with perfilador.etapa("carga_datos") as medicion:
+        inicio_carga = datetime.now()
+        almacen = obtener_almacen()
+        estado = almacen.actualizar()
+        # Fallo: en este rerun hubo carga completa o ingesta incremental
+        medicion.anotar(
+            cache="fallo" if almacen.ultima_ingesta["momento"] >= inicio_carga else "acierto",
+            ingesta=almacen.ultima_ingesta["modo"]
+        )
+    version = estado["version"]
+    columnas_staffs = list(estado["tablas"]["staffs"].columns)
+
+    # Dataset combinado
+    merged_data = estado["hechos"]
+    min_date = merged_data["order_date"].min()
+    max_date = merged_data["order_date"].max()
+    todas_categorias = merged_data["category_name"].unique()
+    max_total = merged_data["total"].max()
 
-products, order_items, orders, categories, staffs = load_data()
+    # Cubo de ventas (día x categoría x vendedor x producto) que alimenta KPIs y gráficos
+    cubo = estado["cubo"]
+    nombres_categorias = estado["nombres"]["categorias"]
 
-# ============================================
-# PREPARAR DATOS PARA FILTROS (CORREGIDO)
-# ============================================
-# Crear dataset combinado COMPLETO con staffs
-orders["order_date"] = pd.to_datetime(orders["order_date"])
-merged_data = (
-    order_items
-    .merge(products, on="product_id")
-    .merge(categories, on="category_id")
-    .merge(orders, on="order_id")
-    .merge(staffs, on="staff_id")  # ¡AGREGAR STAFFS!
-)
-merged_data["total"] = merged_data["quantity"] * merged_data["list_price_order"] * (1 - merged_data["discount"])
-merged_data["mes"] = merged_data["order_date"].dt.to_period("M").astype(str)
+    # Ventas diarias acumuladas por categoría: totales de cualquier rango en tiempo constante
+    acumulados = estado["acumulados"]
+
+    # Índices de ids distintos por categoría y día para los conteos del panel ejecutivo
+    indices_distintos = estado["indices_distintos"]
+
+    # Clientes distintos y ventas por cohorte de primera compra y mes
+    cohortes = estado["cohortes"]
+
+    def calcular_series(categoria_ids, fecha_ini, fecha_fin):
+        return calcular_resultados(cubo, acumulados, estado["nombres"], categoria_ids, fecha_ini, fecha_fin)
+
+    def calcular_distintos(categoria_ids, fecha_ini, fecha_fin, aproximado):
+        return calcular_conteos(indices_distintos, categoria_ids, fecha_ini, fecha_fin, aproximado)
+
+    def filas_detalle(categorias, categoria_ids, fecha_ini, fecha_fin):
+        datos_filtrados = aplicar_filtros(merged_data, categorias, fecha_ini, fecha_fin, 0)
+        columnas_disponibles = [col for col in ['product_name', 'category_name', 'quantity', 'total', 'order_date'] 
+                               if col in datos_filtrados.columns]
+        return datos_filtrados[columnas_disponibles]
+
+    def ventas_inventario(fecha_ini, fecha_fin):
+        return ventas_desde_hechos(merged_data, fecha_ini, fecha_fin)
+
+    def pedidos_clientes():
+        return pedidos_desde_hechos(merged_data)
+else:
+    # Motor SQL embebido: filtros y agregaciones se resuelven con consultas y
+    # solo llegan a pandas las series ya agregadas
+    with perfilador.etapa("carga_datos") as medicion:
+        motor = obtener_motor_sql(MOTOR_DATOS)
+        version_previa = motor.estado["version"] if motor.estado else None
+        estado = motor.actualizar()
+        medicion.anotar(cache="acierto" if estado["version"] == version_previa else "fallo", motor=MOTOR_DATOS)
+    version = estado["version"]
+    columnas_staffs = estado["columnas_staffs"]
+    min_date = estado["fecha_min"]
+    max_date = estado["fecha_max"]
+    nombres_categorias = estado["categorias"]
+    todas_categorias = nombres_categorias.to_numpy()
+    max_total = estado["max_total"]
+    cohortes = estado["cohortes"]
+
+    def calcular_series(categoria_ids, fecha_ini, fecha_fin):
+        return motor.resultados(categoria_ids, fecha_ini, fecha_fin)
+
+    def calcular_distintos(categoria_ids, fecha_ini, fecha_fin, aproximado):
+        return motor.conteos(categoria_ids, fecha_ini, fecha_fin, aproximado)
+
+    def filas_detalle(categorias, categoria_ids, fecha_ini, fecha_fin):
+        return motor.detalle(categoria_ids, fecha_ini, fecha_fin)
+
+    def ventas_inventario(fecha_ini, fecha_fin):
+        return motor.ventas_tienda_producto(fecha_ini, fecha_fin)
+
+    def pedidos_clientes():
+        return motor.pedidos_clientes()
 
 # ============================================
 # SIDEBAR CON FILTROS FUNCIONALES
@@ -92,8 +166,6 @@ with st.sidebar:
     
     # Filtro por rango de fechas
     st.subheader("📅 Rango de Fechas")
-    min_date = merged_data["order_date"].min()
-    max_date = merged_data["order_date"].max()
     
     fecha_inicio = st.date_input(
         "Fecha inicio:",
@@ -111,46 +183,52 @@ with st.sidebar:
     
     # Filtro por categorías
     st.subheader("🚴 Categorías")
-    todas_categorias = merged_data["category_name"].unique()
     categorias_seleccionadas = st.multiselect(
         "Seleccionar categorías:",
         options=todas_categorias,
         default=todas_categorias
     )
-    
-    # Filtro por monto mínimo
-    st.subheader("💰 Monto Mínimo")
-    monto_minimo = st.slider(
-        "Ventas mínimas por producto:",
-        min_value=0,
-        max_value=int(merged_data["total"].max()),
-        value=0,
-        step=100
-    )
 
 # ============================================
-# APLICAR FILTROS AL DATASET
+# RESULTADOS AGREGADOS DEL FILTRO
 # ============================================
-def aplicar_filtros(df, categorias, fecha_ini, fecha_fin, monto_min):
-    # Filtrar por categorías
-    df_filtrado = df[df["category_name"].isin(categorias)]
-    
-    # Filtrar por fechas
-    df_filtrado = df_filtrado[
-        (df_filtrado["order_date"] >= pd.to_datetime(fecha_ini)) & 
-        (df_filtrado["order_date"] <= pd.to_datetime(fecha_fin))
-    ]
-    
-    return df_filtrado
-
-# Aplicar filtros
-datos_filtrados = aplicar_filtros(
-    merged_data, 
-    categorias_seleccionadas, 
-    fecha_inicio, 
-    fecha_fin, 
-    monto_minimo
-)
+# Compartidos entre sesiones en un cache LRU acotado
+categoria_ids = nombres_categorias.index[nombres_categorias.isin(categorias_seleccionadas)]
+cache_resultados = obtener_cache_resultados()
+with perfilador.etapa("agregaciones") as medicion:
+    resultados = cache_resultados.obtener(
+        clave_filtros("series", version, categorias_seleccionadas, fecha_inicio, fecha_fin),
+        medicion.envolver(
+            lambda: calcular_series(categoria_ids, fecha_inicio, fecha_fin)
+        )
+    )
+
+
+def obtener_conteos(categorias, categoria_ids, fecha_ini, fecha_fin, aproximado):
+    with perfilador.etapa("conteos") as medicion:
+        return cache_resultados.obtener(
+            clave_filtros("conteos", version, categorias, fecha_ini, fecha_fin, aproximado),
+            medicion.envolver(
+                lambda: calcular_distintos(categoria_ids, fecha_ini, fecha_fin, aproximado)
+            )
+        )
+
+
+with st.sidebar:
+    stats_cache = cache_resultados.estadisticas()
+    st.caption(
+        f"⚡ Cache de resultados: {stats_cache['aciertos']} aciertos / {stats_cache['fallos']} fallos · "
+        f"{stats_cache['uso_mb']:.1f} de {stats_cache['presupuesto_mb']:.0f} MB"
+    )
+    if MOTOR_DATOS == "pandas":
+        ingesta = almacen.ultima_ingesta
+        st.caption(
+            f"🔄 Última ingesta ({ingesta['modo']}): {ingesta['filas']:,} líneas · "
+            f"{ingesta['momento'].strftime('%H:%M:%S')}"
+        )
+        st.caption(f"🧮 Tabla de hechos: {len(merged_data):,} filas · {estado['memoria_hechos_mb']:.1f} MB")
+    else:
+        st.caption(f"🗄️ Motor {MOTOR_DATOS}: {estado['filas']:,} filas en la tabla de hechos")
 
 # ============================================
 # HEADER PROFESIONAL
@@ -161,203 +239,366 @@ with col2:
     st.markdown(f"**Período analizado: {fecha_inicio} al {fecha_fin}**")
 
 # ============================================
-# PANEL DE KPIs PRINCIPALES (CON FILTROS)
+# SECCIONES COMO FRAGMENTOS
 # ============================================
-st.markdown("## 📊 Panel Ejecutivo")
-
-# Cálculos con datos filtrados
-ventas_totales_filtradas = datos_filtrados["total"].sum()
-num_ordenes_filtradas = datos_filtrados["order_id"].nunique()
-num_productos_filtrados = datos_filtrados["product_id"].nunique()
-num_clientes_filtrados = datos_filtrados["customer_id"].nunique()
-
-# Layout de métricas
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-    st.metric("💰 Ventas Totales", f"S/ {ventas_totales_filtradas:,.0f}")
-    st.markdown('</div>', unsafe_allow_html=True)
-
-with col2:
-    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-    st.metric("📦 Total de Órdenes", f"{num_ordenes_filtradas:,}")
-    st.markdown('</div>', unsafe_allow_html=True)
-
-with col3:
-    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-    st.metric("🚲 Productos Vendidos", f"{num_productos_filtrados:,}")
-    st.markdown('</div>', unsafe_allow_html=True)
+# Los filtros de la barra lateral (fechas y categorías) afectan a todo el dashboard.
+# Los controles propios de cada sección viven dentro de su fragmento, de modo que
+# al moverlos solo se vuelve a ejecutar esa sección y no el script completo.
 
-with col4:
-    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-    st.metric("👥 Clientes Atendidos", f"{num_clientes_filtrados:,}")
-    st.markdown('</div>', unsafe_allow_html=True)
+@st.fragment
+@perfilador.seccion("kpis")
+def seccion_kpis(resultados, categorias, categoria_ids, fecha_ini, fecha_fin):
+    st.markdown("## 📊 Panel Ejecutivo")
+    
+    # Conteos de distintos aproximados para rangos muy grandes
+    conteo_aproximado = st.checkbox(
+        "Conteo aproximado (HyperLogLog)",
+        value=False,
+        help="Estima órdenes, productos y clientes distintos con un error típico de ~1.6%"
+    )
+    conteos = obtener_conteos(categorias, categoria_ids, fecha_ini, fecha_fin, conteo_aproximado)
+    
+    # Layout de métricas
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.metric("💰 Ventas Totales", f"S/ {resultados['ventas_totales']:,.0f}")
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.metric("📦 Total de Órdenes", f"{conteos['num_ordenes']:,}")
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.metric("🚲 Productos Vendidos", f"{conteos['num_productos']:,}")
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.metric("👥 Clientes Atendidos", f"{conteos['num_clientes']:,}")
+        st.markdown('</div>', unsafe_allow_html=True)
 
-# ============================================
-# PESTAÑAS CON GRÁFICOS FILTRADOS
-# ============================================
-tab1, tab2, tab3, tab4 = st.tabs(["📈 Ventas", "🚴 Productos", "👥 Equipo", "📋 Descargas"])
 
-with tab1:
+@st.fragment
+@perfilador.seccion("ventas")
+def seccion_ventas(resultados):
     st.markdown("## 📈 Análisis de Ventas")
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("Ventas por Categoría")
-        ventas_categoria = datos_filtrados.groupby("category_name")["total"].sum().sort_values(ascending=False)
+        ventas_categoria = resultados["ventas_categoria"]
         
         if not ventas_categoria.empty:
-            fig1, ax1 = plt.subplots(figsize=(10, 6))
-            colors = plt.cm.Blues(np.linspace(0.4, 0.9, len(ventas_categoria)))
-            ventas_categoria.plot(kind='bar', ax=ax1, color=colors)
-            ax1.set_title("Ventas por Categoría", fontsize=14, fontweight='bold')
-            ax1.set_ylabel("Ventas Totales (S/.)")
-            ax1.yaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"S/ {x:,.0f}"))
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
-            st.pyplot(fig1)
+            st.image(grafico_ventas_categoria(ventas_categoria), width="stretch")
         else:
             st.info("No hay datos para las categorías seleccionadas")
     
     with col2:
-        st.subheader("Evolución Mensual")
-        ventas_mensuales = datos_filtrados.groupby("mes")["total"].sum()
+        st.subheader("Evolución de Ventas")
+        # La serie diaria del filtro ya está en `resultados`: cambiar de granularidad solo
+        # reagrupa sus días (enteros) y no vuelve a tocar fechas ni textos por fila
+        granularidad = GRANULARIDADES[
+            st.radio("Granularidad:", options=list(GRANULARIDADES), index=list(GRANULARIDADES).index("Mes"), horizontal=True)
+        ]
+        if granularidad == "mes":
+            ventas_periodo = resultados["ventas_mensuales"]
+        else:
+            ventas_periodo = ventas_por_periodo(resultados["ventas_diarias"], granularidad)
         
-        if not ventas_mensuales.empty:
-            fig2, ax2 = plt.subplots(figsize=(10, 6))
-            ax2.plot(ventas_mensuales.index, ventas_mensuales.values, marker='o', linewidth=3, color='#2E8B57')
-            ax2.set_title("Evolución Mensual de Ventas", fontsize=14, fontweight='bold')
-            ax2.set_ylabel("Ventas Totales (S/.)")
-            ax2.yaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"S/ {x:,.0f}"))
-            plt.xticks(rotation=45, ha='right')
-            plt.grid(True, alpha=0.3)
-            plt.tight_layout()
-            st.pyplot(fig2)
+        if not ventas_periodo.empty:
+            st.image(grafico_ventas_periodo(ventas_periodo, granularidad), width="stretch")
         else:
             st.info("No hay datos para el período seleccionado")
 
-with tab2:
+
+@st.fragment
+@perfilador.seccion("productos")
+def seccion_productos(resultados, max_monto):
     st.markdown("## 🚴 Gestión de Productos")
     
-    # Top productos con filtro de monto mínimo
-    top_prod = datos_filtrados.groupby("product_name")["total"].sum()
-    top_prod = top_prod[top_prod >= monto_minimo].sort_values(ascending=False).head(10)
+    # Filtro por monto mínimo (solo afecta a este gráfico)
+    monto_minimo = st.slider(
+        "💰 Ventas mínimas por producto:",
+        min_value=0,
+        max_value=max_monto,
+        value=0,
+        step=100
+    )
+    
+    # Top productos con filtro de monto mínimo: selección parcial sobre las sumas por
+    # código de nombre, sin ordenar todos los productos en cada movimiento del slider
+    top_prod = top_k(resultados["ventas_productos"], TOP_PRODUCTOS, monto_minimo)
     
     if not top_prod.empty:
-        fig3, ax3 = plt.subplots(figsize=(12, 8))
-        colors = plt.cm.Greens(np.linspace(0.3, 0.9, len(top_prod)))
-        top_prod.plot(kind='barh', ax=ax3, color=colors)
-        ax3.set_title("Top Productos Más Vendidos", fontsize=14, fontweight='bold')
-        ax3.set_xlabel("Ventas Totales (S/.)")
-        ax3.xaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"S/ {x:,.0f}"))
-        plt.tight_layout()
-        st.pyplot(fig3)
+        st.image(grafico_top_productos(top_prod), width="stretch")
     else:
         st.info("No hay productos que cumplan con el monto mínimo seleccionado")
 
-with tab3:
+
+@st.fragment
+@perfilador.seccion("clientes")
+def seccion_clientes(categorias, categoria_ids, fecha_ini, fecha_fin):
+    st.markdown("## 👤 Segmentación de Clientes (RFM)")
+    
+    # Pedidos por cliente: se arman una vez por versión de los datos; cada filtro solo los recorta
+    version_rfm = (version, version_clientes())
+    with perfilador.etapa("base_clientes") as medicion:
+        base = construir_base_clientes(medicion.envolver(pedidos_clientes), version_rfm)
+    with perfilador.etapa("rfm") as medicion:
+        rfm = cache_resultados.obtener(
+            clave_filtros("rfm", version_rfm, categorias, fecha_ini, fecha_fin),
+            medicion.envolver(
+                lambda: calcular_rfm(base, categoria_ids, fecha_ini, fecha_fin)
+            )
+        )
+    st.caption(
+        f"Recencia en días hasta el {fecha_fin} · puntajes 1-5 por quintiles entre los clientes con compras en el período"
+    )
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("👥 Clientes con Compras", f"{rfm['activos']:,} de {rfm['clientes']:,}")
+    col2.metric("🔁 Recompra", f"{rfm['recompra']:.1%}")
+    col3.metric("💳 Monto por Cliente", f"S/ {rfm['monto_medio']:,.0f}")
+    col4.metric("⏱️ Recencia Mediana", f"{rfm['recencia_mediana']:,.0f} días")
+    
+    if rfm["segmentos"].empty:
+        st.info("No hay clientes con compras para los filtros seleccionados")
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.image(grafico_ventas_segmento(rfm["segmentos"]["Ventas"]), width="stretch")
+    with col2:
+        st.dataframe(
+            rfm["segmentos"].style.format({
+                "% Clientes": "{:.1f}%", "Recencia media (días)": "{:,.0f}", "Pedidos por cliente": "{:.2f}",
+                "Monto medio": "S/ {:,.0f}", "Ventas": "S/ {:,.0f}", "% Ventas": "{:.1f}%",
+            }),
+            width="stretch"
+        )
+    
+    st.subheader("Clientes con Mayor Monto")
+    st.dataframe(
+        rfm["top_clientes"].style.format({"Monto": "S/ {:,.0f}"}),
+        hide_index=True,
+        width="stretch"
+    )
+
+
+@st.fragment
+@perfilador.seccion("cohortes")
+def seccion_cohortes(cohortes, fecha_ini, fecha_fin):
+    st.markdown("## 🔁 Cohortes de Recompra")
+    
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        medida = st.radio("Medida:", options=list(MEDIDAS), horizontal=True)
+    with col2:
+        meses_disponibles = max(cohortes["num_meses"] - 1, 1)
+        meses_max = st.slider(
+            "Meses desde la primera compra:", min_value=0, max_value=meses_disponibles, value=min(12, meses_disponibles)
+        )
+    
+    # Matrices ya acumuladas: aquí solo se eligen filas y se desplazan columnas
+    with perfilador.etapa("matriz"):
+        matriz, tamano = matriz_cohortes(cohortes, fecha_ini, fecha_fin, meses_max, MEDIDAS[medida])
+    st.caption(
+        "Cohorte: mes de la primera compra del cliente (todo el histórico, todas las categorías) · "
+        f"cohortes iniciadas entre {fecha_ini} y {fecha_fin}, con actividad hasta {fecha_fin}"
+    )
+    
+    if matriz.empty:
+        st.info("No hay clientes nuevos en el período seleccionado")
+        return
+    
+    formato = {"retencion": "{:.1%}", "clientes": "{:,.0f}"}.get(MEDIDAS[medida], "S/ {:,.0f}")
+    st.dataframe(
+        pd.concat([tamano, matriz], axis=1).style
+        .format(formato, subset=list(matriz.columns), na_rep="")
+        .background_gradient(cmap="Blues", subset=list(matriz.columns), axis=None),
+        width="stretch"
+    )
+
+
+@st.fragment
+@perfilador.seccion("equipo")
+def seccion_equipo(resultados, columnas_staffs):
     st.markdown("## 👥 Desempeño del Equipo")
     
-    # Vendedores con datos filtrados (CORREGIDO)
-    # Verificar qué columnas de staffs existen
-    st.write("**Columnas disponibles en staffs:**", list(staffs.columns))
+    # Vendedores con datos filtrados (desde el cubo, por staff_id)
+    st.write("**Columnas disponibles en staffs:**", columnas_staffs)
     
-    # Usar las columnas correctas que existen en staffs
-    if 'first_name' in datos_filtrados.columns and 'last_name' in datos_filtrados.columns:
-        ventas_vendedores = datos_filtrados.groupby(["first_name", "last_name"])["total"].sum().sort_values(ascending=False).head(8)
-    elif 'staff_name' in datos_filtrados.columns:
-        ventas_vendedores = datos_filtrados.groupby("staff_name")["total"].sum().sort_values(ascending=False).head(8)
-    else:
-        # Si no hay nombres, usar staff_id
-        ventas_vendedores = datos_filtrados.groupby("staff_id")["total"].sum().sort_values(ascending=False).head(8)
+    ventas_vendedores = resultados["ventas_vendedores"]
     
     if not ventas_vendedores.empty:
-        fig4, ax4 = plt.subplots(figsize=(10, 6))
-        colors = plt.cm.Oranges(np.linspace(0.4, 0.9, len(ventas_vendedores)))
-        
-        # Crear etiquetas según el tipo de agrupación
-        if isinstance(ventas_vendedores.index, pd.MultiIndex):
-            # Si es MultiIndex (first_name, last_name)
-            nombres_vendedores = [f"{f} {l}" for f, l in ventas_vendedores.index]
-        else:
-            # Si es single index
-            nombres_vendedores = [str(idx) for idx in ventas_vendedores.index]
-        
-        bars = ax4.bar(nombres_vendedores, ventas_vendedores.values, color=colors)
-        ax4.set_title("Top Vendedores por Ventas", fontsize=14, fontweight='bold')
-        ax4.set_ylabel("Ventas Totales (S/.)")
-        ax4.yaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"S/ {x:,.0f}"))
-        
-        # Rotar etiquetas si son muy largas
-        ax4.set_xticklabels(nombres_vendedores, rotation=45, ha='right')
-        
-        plt.tight_layout()
-        st.pyplot(fig4)
+        # Imagen cacheada (etiquetas "nombre apellido")
+        st.image(grafico_top_vendedores(ventas_vendedores), width="stretch")
     else:
         st.info("No hay datos de vendedores para los filtros seleccionados")
 
-with tab4:
+
+@st.fragment
+@perfilador.seccion("inventario")
+def seccion_inventario(categorias, categoria_ids, fecha_fin):
+    st.markdown("## 📦 Cobertura de Inventario")
+    
+    # Stock actual (stocks.csv) contra la venta diaria de los últimos días hasta la fecha fin
+    col1, col2 = st.columns(2)
+    with col1:
+        ventana = st.slider("📆 Ventana de ventas (días):", min_value=7, max_value=365, value=VENTANA_DIAS)
+    with col2:
+        dias_riesgo = st.slider("⏳ Riesgo de quiebre con cobertura menor a (días):", min_value=1, max_value=90, value=DIAS_RIESGO)
+    
+    version_stock = version_inventario()
+    inventario = construir_inventario(version=(version, version_stock))
+    ventana_ini, ventana_fin, dias = ventana_ventas(fecha_fin, ventana, min_date)
+    with perfilador.etapa("evaluacion") as medicion:
+        evaluacion = cache_resultados.obtener(
+            clave_filtros("inventario", (version, version_stock), categorias, ventana_ini, ventana_fin, dias_riesgo),
+            medicion.envolver(
+                lambda: evaluar_inventario(
+                    inventario, ventas_inventario(ventana_ini, ventana_fin), dias, categoria_ids, dias_riesgo
+                )
+            )
+        )
+    st.caption(
+        f"Venta diaria promedio del {ventana_ini} al {ventana_fin} ({dias} días) · "
+        f"sobrestock: más de {DIAS_SOBRESTOCK} días de cobertura"
+    )
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("📦 Unidades en Stock", f"{evaluacion['unidades']:,}")
+    col2.metric("⚠️ En Riesgo de Quiebre", f"{evaluacion['en_riesgo']:,}")
+    col3.metric("🚫 Agotados con Demanda", f"{evaluacion['agotados']:,}")
+    col4.metric("📈 Con Sobrestock", f"{evaluacion['sobrestock']:,}")
+    
+    st.subheader("Cobertura por Tienda")
+    st.dataframe(
+        evaluacion["resumen_tiendas"].style.format(
+            {"Venta diaria": "{:,.2f}", "Días de cobertura": "{:,.0f}", "Unidades de exceso": "{:,.0f}"}
+        ),
+        width="stretch"
+    )
+    
+    col1, col2 = st.columns(2)
+    formato_detalle = {"Venta diaria": "{:,.2f}", "Días de cobertura": "{:,.1f}"}
+    with col1:
+        st.subheader("Riesgo de Quiebre")
+        if not evaluacion["riesgo"].empty:
+            st.dataframe(evaluacion["riesgo"].style.format(formato_detalle), hide_index=True, width="stretch")
+        else:
+            st.success("Ningún producto en riesgo de quiebre con la ventana seleccionada")
+    with col2:
+        st.subheader("Mayor Sobrestock")
+        if not evaluacion["exceso"].empty:
+            st.dataframe(evaluacion["exceso"].style.format(formato_detalle), hide_index=True, width="stretch")
+        else:
+            st.info("No hay productos con sobrestock")
+
+
+@st.fragment
+@perfilador.seccion("descargas")
+def seccion_descargas(resultados, categorias, categoria_ids, fecha_ini, fecha_fin):
     st.markdown("## 📋 Reportes Descargables")
     
-    # Generar reportes descargables con datos filtrados
-    @st.cache_data
-    def convert_df_to_csv(df):
-        return df.to_csv(index=False).encode('utf-8')
+    # Los reportes se generan recién al pulsar el botón (no en cada rerun)
+    formato = st.radio("Formato:", options=list(FORMATOS), horizontal=True)
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("Reporte de Ventas Filtrado")
-        # Seleccionar columnas que existen
-        columnas_disponibles = [col for col in ['product_name', 'category_name', 'quantity', 'total', 'order_date'] 
-                               if col in datos_filtrados.columns]
-        ventas_detalle = datos_filtrados[columnas_disponibles]
-        csv_ventas = convert_df_to_csv(ventas_detalle)
+        
+        def ventas_detalle():
+            # Solo la descarga necesita las filas de detalle
+            return filas_detalle(categorias, categoria_ids, fecha_ini, fecha_fin)
         
         st.download_button(
             label="📥 Descargar Reporte de Ventas",
-            data=csv_ventas,
-            file_name=f"reporte_ventas_{fecha_inicio}_a_{fecha_fin}.csv",
-            mime="text/csv"
+            data=perfilador.descarga("reporte_ventas", descarga_diferida(ventas_detalle, formato)),
+            file_name=nombre_archivo(f"reporte_ventas_{fecha_ini}_a_{fecha_fin}", formato),
+            mime=FORMATOS[formato]["mime"],
+            on_click="ignore"
         )
     
     with col2:
         st.subheader("Resumen Ejecutivo")
-        resumen_data = {
-            'Métrica': ['Ventas Totales', 'Órdenes', 'Productos', 'Clientes'],
-            'Valor': [
-                f"S/ {ventas_totales_filtradas:,.0f}",
-                f"{num_ordenes_filtradas:,}",
-                f"{num_productos_filtrados:,}", 
-                f"{num_clientes_filtrados:,}"
-            ]
-        }
-        resumen_df = pd.DataFrame(resumen_data)
-        csv_resumen = convert_df_to_csv(resumen_df)
+        
+        def resumen_ejecutivo():
+            # El resumen descargable usa siempre conteos exactos
+            conteos = obtener_conteos(categorias, categoria_ids, fecha_ini, fecha_fin, False)
+            resumen_data = {
+                'Métrica': ['Ventas Totales', 'Órdenes', 'Productos', 'Clientes'],
+                'Valor': [
+                    f"S/ {resultados['ventas_totales']:,.0f}",
+                    f"{conteos['num_ordenes']:,}",
+                    f"{conteos['num_productos']:,}", 
+                    f"{conteos['num_clientes']:,}"
+                ]
+            }
+            return pd.DataFrame(resumen_data)
         
         st.download_button(
             label="📥 Descargar Resumen Ejecutivo",
-            data=csv_resumen,
-            file_name=f"resumen_ejecutivo_{fecha_inicio}_a_{fecha_fin}.csv",
-            mime="text/csv"
+            data=perfilador.descarga("resumen_ejecutivo", descarga_diferida(resumen_ejecutivo, formato)),
+            file_name=nombre_archivo(f"resumen_ejecutivo_{fecha_ini}_a_{fecha_fin}", formato),
+            mime=FORMATOS[formato]["mime"],
+            on_click="ignore"
         )
 
+
+# ============================================
+# PANEL DE KPIs PRINCIPALES (CON FILTROS)
+# ============================================
+seccion_kpis(resultados, categorias_seleccionadas, categoria_ids, fecha_inicio, fecha_fin)
+
+# ============================================
+# PESTAÑAS CON GRÁFICOS FILTRADOS
+# ============================================
+tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(
+    ["📈 Ventas", "🚴 Productos", "📦 Inventario", "👤 Clientes", "🔁 Cohortes", "👥 Equipo", "📋 Descargas"]
+)
+
+with tab1:
+    seccion_ventas(resultados)
+
+with tab2:
+    seccion_productos(resultados, int(max_total))
+
+with tab3:
+    seccion_inventario(categorias_seleccionadas, categoria_ids, fecha_fin)
+
+with tab4:
+    seccion_clientes(categorias_seleccionadas, categoria_ids, fecha_inicio, fecha_fin)
+
+with tab5:
+    seccion_cohortes(cohortes, fecha_inicio, fecha_fin)
+
+with tab6:
+    seccion_equipo(resultados, columnas_staffs)
+
+with tab7:
+    seccion_descargas(resultados, categorias_seleccionadas, categoria_ids, fecha_inicio, fecha_fin)
+
 # ============================================
 # ALERTAS Y RECOMENDACIONES INTELIGENTES
 # ============================================
 st.markdown("## ⚠️ Alertas y Recomendaciones")
 
 # Alertas basadas en datos filtrados
-if len(datos_filtrados) == 0:
+if resultados["ventas_categoria"].empty:
     st.error("🚨 No hay datos para los filtros seleccionados. Amplía el rango de fechas o categorías.")
-elif ventas_totales_filtradas == 0:
+elif resultados["ventas_totales"] == 0:
     st.warning("⚠️ Las ventas son cero para los filtros seleccionados")
 else:
     # Análisis de categorías sin ventas
     todas_cats = set(categorias_seleccionadas)
-    cats_con_ventas = set(datos_filtrados["category_name"].unique())
+    cats_con_ventas = set(resultados["ventas_categoria"].index)
     cats_sin_ventas = todas_cats - cats_con_ventas
     
     if cats_sin_ventas:
@@ -376,3 +617,9 @@ st.markdown(
     "</div>", 
     unsafe_allow_html=True
 )
+
+# Panel de depuración con el desglose del rerun (solo con el perfilador activado)
+perfilador.finalizar({
+    "Cache de resultados": cache_resultados.estadisticas(),
+    "Cache de gráficos": obtener_cache_graficos().estadisticas(),
+})
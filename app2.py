@@ -13,6 +13,10 @@ import numpy as np
 from datetime import datetime
 import io
 
+from datos import version_datos, load_data, construir_hechos, aplicar_filtros, etiquetas_mes
+from agregados import nombres_dimensiones
+from ranking import TOP_PRODUCTOS, TOP_VENDEDORES, sumar_por_nombre, top_k
+
 # ============================================
 # CONFIGURACIÓN GENERAL MEJORADA
 # ============================================
@@ -53,30 +57,17 @@ st.markdown("""
 # ============================================
 # CARGA DE DATOS CON CACHE
 # ============================================
-@st.cache_data
-def load_data():
-    products = pd.read_csv("products.csv")
-    order_items = pd.read_csv("order_items.csv")
-    orders = pd.read_csv("orders.csv")
-    categories = pd.read_csv("categories.csv")
-    staffs = pd.read_csv("staffs.csv")
-    
-    # Arreglo de columnas duplicadas
-    order_items = order_items.rename(columns={"list_price": "list_price_order"})
-    products = products.rename(columns={"list_price": "list_price_product"})
-    
-    return products, order_items, orders, categories, staffs
-
-products, order_items, orders, categories, staffs = load_data()
+version = version_datos()
+products, order_items, orders, categories, staffs = load_data(version=version)
 
 # ============================================
 # PREPARAR DATOS PARA FILTROS
 # ============================================
-# Crear dataset combinado
-orders["order_date"] = pd.to_datetime(orders["order_date"])
-merged_data = order_items.merge(products, on="product_id").merge(categories, on="category_id").merge(orders, on="order_id")
-merged_data["total"] = merged_data["quantity"] * merged_data["list_price_order"] * (1 - merged_data["discount"])
-merged_data["mes"] = merged_data["order_date"].dt.to_period("M").astype(str)
+# Dataset combinado (cacheado por versión de los CSV)
+merged_data = construir_hechos(version=version)
+
+# Códigos de nombre de productos y vendedores para los rankings (cacheados por versión)
+nombres = nombres_dimensiones(version=version)
 
 # ============================================
 # SIDEBAR CON FILTROS FUNCIONALES
@@ -125,19 +116,6 @@ with st.sidebar:
 # ============================================
 # APLICAR FILTROS AL DATASET
 # ============================================
-def aplicar_filtros(df, categorias, fecha_ini, fecha_fin, monto_min):
-    # Filtrar por categorías
-    df_filtrado = df[df["category_name"].isin(categorias)]
-    
-    # Filtrar por fechas
-    df_filtrado = df_filtrado[
-        (df_filtrado["order_date"] >= pd.to_datetime(fecha_ini)) & 
-        (df_filtrado["order_date"] <= pd.to_datetime(fecha_fin))
-    ]
-    
-    # Filtrar por monto mínimo (para gráficos específicos)
-    return df_filtrado
-
 # Aplicar filtros
 datos_filtrados = aplicar_filtros(
     merged_data, 
@@ -201,7 +179,7 @@ with tab1:
     
     with col1:
         st.subheader("Ventas por Categoría")
-        ventas_categoria = datos_filtrados.groupby("category_name")["total"].sum().sort_values(ascending=False)
+        ventas_categoria = datos_filtrados.groupby("category_name", observed=True)["total"].sum().sort_values(ascending=False)
         
         if not ventas_categoria.empty:
             fig1, ax1 = plt.subplots(figsize=(10, 6))
@@ -219,6 +197,7 @@ with tab1:
     with col2:
         st.subheader("Evolución Mensual")
         ventas_mensuales = datos_filtrados.groupby("mes")["total"].sum()
+        ventas_mensuales.index = etiquetas_mes(ventas_mensuales.index)
         
         if not ventas_mensuales.empty:
             fig2, ax2 = plt.subplots(figsize=(10, 6))
@@ -236,9 +215,13 @@ with tab1:
 with tab2:
     st.markdown("## 🚴 Gestión de Productos")
     
-    # Top productos con filtro de monto mínimo
-    top_prod = datos_filtrados.groupby("product_name")["total"].sum()
-    top_prod = top_prod[top_prod >= monto_minimo].sort_values(ascending=False).head(10)
+    # Top productos con filtro de monto mínimo: sumas por código de nombre y selección
+    # parcial de los mayores; solo los elegidos llevan nombre
+    top_prod = top_k(
+        sumar_por_nombre(nombres["codigos_productos"], datos_filtrados["product_id"], datos_filtrados["total"]),
+        TOP_PRODUCTOS,
+        monto_minimo,
+    )
     
     if not top_prod.empty:
         fig3, ax3 = plt.subplots(figsize=(12, 8))
@@ -256,7 +239,10 @@ with tab3:
     st.markdown("## 👥 Desempeño del Equipo")
     
     # Vendedores con datos filtrados
-    ventas_vendedores = datos_filtrados.groupby(["first_name", "last_name"])["total"].sum().sort_values(ascending=False).head(8)
+    ventas_vendedores = top_k(
+        sumar_por_nombre(nombres["codigos_vendedores"], datos_filtrados["staff_id"], datos_filtrados["total"]),
+        TOP_VENDEDORES,
+    )
     
     if not ventas_vendedores.empty:
         fig4, ax4 = plt.subplots(figsize=(10, 6))
@@ -266,9 +252,8 @@ with tab3:
         ax4.set_ylabel("Ventas Totales (S/.)")
         ax4.yaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"S/ {x:,.0f}"))
         
-        # Formatear nombres en el eje X
-        nombres_vendedores = [f"{f} {l}" for f, l in ventas_vendedores.index]
-        ax4.set_xticklabels(nombres_vendedores, rotation=45, ha='right')
+        # Nombres "nombre apellido" en el eje X
+        ax4.set_xticklabels(ventas_vendedores.index, rotation=45, ha='right')
         
         plt.tight_layout()
         st.pyplot(fig4)
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark por etapas del pipeline del dashboard (sin interfaz).
+
+Ejecuta cada etapa de app.py sobre datos sintéticos de tamaño creciente y registra
+tiempo y memoria pico por etapa en un JSON comparable entre revisiones.
+
+Uso:
+    python benchmark.py --escalas 1 10 100 --salida benchmark.json
+    python benchmark.py --escalas 1 10 100 --comparar benchmark_anterior.json
+
+@author: elias
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.logger import set_log_level
+
+# Sin servidor de Streamlit los caches avisan en cada llamada
+set_log_level("error")
+
+from datos import CARPETA_SNAPSHOT, leer_tabla, leer_tablas, unir_hechos, aplicar_filtros, memoria_mb
+from agregados import cubo_desde_hechos, acumulados_desde_cubo, nombres_desde_tablas, calcular_resultados
+from distintos import indices_desde_hechos, calcular_conteos
+from exportar import exportar
+from inventario import VENTANA_DIAS, inventario_desde_tablas, ventana_ventas, ventas_desde_hechos, evaluar_inventario
+from clientes import pedidos_desde_hechos, base_desde_pedidos, calcular_rfm
+from cohortes import cohortes_desde_hechos, matriz_cohortes
+from ranking import TOP_PRODUCTOS, top_k
+from generar_datos import generar
+import graficos
+
+# Carpeta donde se guardan (y reutilizan) los datos generados para el benchmark
+CARPETA_BENCHMARK = ".benchmark"
+
+# Una etapa es regresión si su tiempo mediano crece más que este factor
+UMBRAL_REGRESION = 1.2
+
+
+# ============================================
+# ETAPAS DEL PIPELINE
+# ============================================
+# Cada etapa recibe el contexto con los resultados de las anteriores y devuelve el suyo
+def _lectura_csv(ctx):
+    # Arranque en frío: sin snapshot, se parsean los CSV
+    shutil.rmtree(os.path.join(ctx["carpeta"], CARPETA_SNAPSHOT), ignore_errors=True)
+    return leer_tablas(ctx["carpeta"])
+
+
+def _lectura_snapshot(ctx):
+    return leer_tablas(ctx["carpeta"])
+
+
+def _union_hechos(ctx):
+    return unir_hechos(*ctx["lectura_snapshot"])
+
+
+def _aplicar_filtros(ctx):
+    # Filtro típico: la mitad de las categorías y el último año
+    hechos = ctx["union_hechos"]
+    return aplicar_filtros(hechos, ctx["categorias"], ctx["fecha_ini"], ctx["fecha_fin"], 0)
+
+
+def _cubo(ctx):
+    return cubo_desde_hechos(ctx["union_hechos"])
+
+
+def _acumulados(ctx):
+    return acumulados_desde_cubo(ctx["cubo"])
+
+
+def _indices_distintos(ctx):
+    return indices_desde_hechos(ctx["union_hechos"])
+
+
+def _nombres(ctx):
+    products, _, _, categories, staffs = ctx["lectura_snapshot"]
+    return nombres_desde_tablas(products, categories, staffs)
+
+
+def _kpis(ctx):
+    return calcular_conteos(ctx["indices_distintos"], ctx["categoria_ids"], ctx["fecha_ini"], ctx["fecha_fin"])
+
+
+def _kpis_aproximados(ctx):
+    return calcular_conteos(ctx["indices_distintos"], ctx["categoria_ids"], ctx["fecha_ini"], ctx["fecha_fin"], True)
+
+
+def _agregaciones(ctx):
+    return calcular_resultados(
+        ctx["cubo"], ctx["acumulados"], ctx["nombres"], ctx["categoria_ids"], ctx["fecha_ini"], ctx["fecha_fin"]
+    )
+
+
+def _top_productos(ctx):
+    # Lo que cuesta mover el slider de monto mínimo de la pestaña de productos
+    return top_k(ctx["agregaciones"]["ventas_productos"], TOP_PRODUCTOS, 0)
+
+
+def _matriz_stock(ctx):
+    products = ctx["lectura_snapshot"][0]
+    return inventario_desde_tablas(leer_tabla("stocks", ctx["carpeta"]), leer_tabla("stores", ctx["carpeta"]), products)
+
+
+def _inventario(ctx):
+    hechos = ctx["union_hechos"]
+    inicio, fin, dias = ventana_ventas(ctx["fecha_fin"], VENTANA_DIAS, hechos["order_date"].min())
+    return evaluar_inventario(ctx["matriz_stock"], ventas_desde_hechos(hechos, inicio, fin), dias, ctx["categoria_ids"])
+
+
+def _base_clientes(ctx):
+    return base_desde_pedidos(pedidos_desde_hechos(ctx["union_hechos"]), leer_tabla("customers", ctx["carpeta"]))
+
+
+def _rfm(ctx):
+    return calcular_rfm(ctx["base_clientes"], ctx["categoria_ids"], ctx["fecha_ini"], ctx["fecha_fin"])
+
+
+def _cohortes(ctx):
+    return cohortes_desde_hechos(ctx["union_hechos"])
+
+
+def _matriz_cohortes(ctx):
+    return matriz_cohortes(ctx["cohortes"], ctx["fecha_ini"], ctx["fecha_fin"], 12)
+
+
+def _graficos(ctx):
+    # Render sin cache: se vacía el cache de imágenes antes de dibujar
+    graficos.obtener_cache_graficos().limpiar()
+    resultados = ctx["agregaciones"]
+    return [
+        graficos.grafico_ventas_categoria(resultados["ventas_categoria"]),
+        graficos.grafico_ventas_mensuales(resultados["ventas_mensuales"]),
+        graficos.grafico_top_productos(top_k(resultados["ventas_productos"], TOP_PRODUCTOS)),
+        graficos.grafico_top_vendedores(resultados["ventas_vendedores"]),
+    ]
+
+
+def _detalle(ctx):
+    columnas = ["product_name", "category_name", "quantity", "total", "order_date"]
+    return ctx["aplicar_filtros"][columnas]
+
+
+def _exportar_csv(ctx):
+    with exportar(_detalle(ctx), "CSV") as archivo:
+        return archivo.seek(0, os.SEEK_END)
+
+
+def _exportar_gzip(ctx):
+    with exportar(_detalle(ctx), "CSV comprimido (gzip)") as archivo:
+        return archivo.seek(0, os.SEEK_END)
+
+
+ETAPAS = [
+    ("lectura_csv", _lectura_csv),
+    ("lectura_snapshot", _lectura_snapshot),
+    ("union_hechos", _union_hechos),
+    ("aplicar_filtros", _aplicar_filtros),
+    ("cubo", _cubo),
+    ("acumulados", _acumulados),
+    ("indices_distintos", _indices_distintos),
+    ("nombres", _nombres),
+    ("kpis", _kpis),
+    ("kpis_aproximados", _kpis_aproximados),
+    ("agregaciones", _agregaciones),
+    ("top_productos", _top_productos),
+    ("matriz_stock", _matriz_stock),
+    ("inventario", _inventario),
+    ("base_clientes", _base_clientes),
+    ("rfm", _rfm),
+    ("cohortes", _cohortes),
+    ("matriz_cohortes", _matriz_cohortes),
+    ("graficos", _graficos),
+    ("exportar_csv", _exportar_csv),
+    ("exportar_gzip", _exportar_gzip),
+]
+
+
+# ============================================
+# MEDICIÓN
+# ============================================
+def medir(funcion, ctx, repeticiones):
+    # Tiempos sin instrumentar + una ejecución aparte con tracemalloc para la memoria pico
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        resultado = funcion(ctx)
+        tiempos.append(time.perf_counter() - inicio)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcion(ctx)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return resultado, tiempos, pico
+
+
+def preparar_datos(escala, semilla):
+    # Los datos de cada (escala, semilla) se generan una sola vez y se reutilizan
+    carpeta = os.path.join(CARPETA_BENCHMARK, f"escala_{escala:g}_semilla_{semilla}")
+    if not os.path.exists(os.path.join(carpeta, "order_items.csv")):
+        generar(carpeta, escala, semilla)
+    return carpeta
+
+
+def ejecutar_escala(escala, semilla, repeticiones):
+    carpeta = preparar_datos(escala, semilla)
+    ctx = {"carpeta": carpeta}
+    filas = []
+    for nombre, funcion in ETAPAS:
+        resultado, tiempos, pico = medir(funcion, ctx, repeticiones)
+        ctx[nombre] = resultado
+
+        if nombre == "union_hechos":
+            # Filtro de referencia para las etapas siguientes
+            hechos = resultado
+            categorias = sorted(hechos["category_name"].cat.categories)
+            ctx["categorias"] = categorias[: max(1, len(categorias) // 2)]
+            ctx["categoria_ids"] = hechos.loc[hechos["category_name"].isin(ctx["categorias"]), "category_id"].unique()
+            ctx["fecha_fin"] = hechos["order_date"].max()
+            ctx["fecha_ini"] = ctx["fecha_fin"] - pd.Timedelta(days=365)
+
+        filas.append({
+            "escala": escala,
+            "filas_hechos": len(ctx["union_hechos"]) if "union_hechos" in ctx else None,
+            "memoria_hechos_mb": memoria_mb(ctx["union_hechos"]) if "union_hechos" in ctx else None,
+            "etapa": nombre,
+            "tiempo_min_s": min(tiempos),
+            "tiempo_mediana_s": statistics.median(tiempos),
+            "memoria_pico_mb": pico / (1024 * 1024),
+        })
+        print(
+            f"  {nombre:<20} {statistics.median(tiempos) * 1000:>10.1f} ms"
+            f" {pico / (1024 * 1024):>10.1f} MB"
+        )
+    return filas
+
+
+def _revision_git():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadatos(semilla, repeticiones):
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "revision": _revision_git(),
+        "semilla": semilla,
+        "repeticiones": repeticiones,
+        "python": sys.version.split()[0],
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "streamlit": st.__version__,
+        "plataforma": platform.platform(),
+    }
+
+
+# ============================================
+# COMPARACIÓN ENTRE REVISIONES
+# ============================================
+def comparar(actual, anterior, umbral=UMBRAL_REGRESION):
+    # Devuelve las etapas cuyo tiempo mediano empeoró más que `umbral`
+    previos = {(fila["escala"], fila["etapa"]): fila for fila in anterior["resultados"]}
+    regresiones = []
+    print(f"\nComparación con revisión {anterior['meta'].get('revision')}:")
+    for fila in actual["resultados"]:
+        previa = previos.get((fila["escala"], fila["etapa"]))
+        if previa is None:
+            continue
+        razon = fila["tiempo_mediana_s"] / max(previa["tiempo_mediana_s"], 1e-9)
+        marca = "  <-- regresión" if razon > umbral else ""
+        print(f"  x{fila['escala']:<8g} {fila['etapa']:<20} {razon:>6.2f}x{marca}")
+        if razon > umbral:
+            regresiones.append((fila["escala"], fila["etapa"], razon))
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark por etapas del dashboard BikeStore.")
+    parser.add_argument("--escalas", type=float, nargs="+", default=[1, 10], help="Factores de escala de los datos")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--repeticiones", type=int, default=3, help="Ejecuciones cronometradas por etapa")
+    parser.add_argument("--salida", default="benchmark.json", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una revisión anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION)
+    args = parser.parse_args()
+
+    informe = {"meta": metadatos(args.semilla, args.repeticiones), "resultados": []}
+    for escala in args.escalas:
+        print(f"Escala x{escala:g}")
+        informe["resultados"].extend(ejecutar_escala(escala, args.semilla, args.repeticiones))
+
+    with open(args.salida, "w", encoding="utf-8") as archivo:
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            regresiones = comparar(informe, json.load(archivo), args.umbral)
+        if regresiones:
+            sys.exit(1)
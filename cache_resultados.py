@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Cache LRU acotado en memoria para los resultados agregados de cada combinación de filtros.
+
+@author: elias
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+# Presupuesto de memoria del cache (MB), configurable por variable de entorno
+PRESUPUESTO_MB = float(os.environ.get("BIKESTORE_CACHE_MB", "64"))
+
+
+def _tamano(valor):
+    # Estimación del tamaño en bytes de un resultado (series, tablas, dicts y escalares)
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, (pd.Series, pd.Index)):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(_tamano(k) + _tamano(v) for k, v in valor.items())
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return sys.getsizeof(valor) + sum(_tamano(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+class CacheResultados:
+    # LRU por bytes: al superar el presupuesto se desalojan las entradas menos usadas
+
+    def __init__(self, presupuesto_bytes):
+        self.presupuesto_bytes = presupuesto_bytes
+        self.uso_bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, calcular):
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._entradas[clave][0]
+            self.fallos += 1
+
+        # Se calcula fuera del lock para no bloquear a otras sesiones
+        valor = calcular()
+        tamano = _tamano(valor)
+
+        with self._lock:
+            if clave not in self._entradas and tamano <= self.presupuesto_bytes:
+                self._entradas[clave] = (valor, tamano)
+                self.uso_bytes += tamano
+                while self.uso_bytes > self.presupuesto_bytes:
+                    _, (_, tamano_desalojado) = self._entradas.popitem(last=False)
+                    self.uso_bytes -= tamano_desalojado
+                    self.desalojos += 1
+        return valor
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "uso_mb": self.uso_bytes / (1024 * 1024),
+                "presupuesto_mb": self.presupuesto_bytes / (1024 * 1024),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "desalojos": self.desalojos,
+            }
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.uso_bytes = 0
+
+
+@st.cache_resource
+def obtener_cache_resultados(presupuesto_mb=PRESUPUESTO_MB):
+    # Una única instancia por proceso, compartida por todas las sesiones
+    return CacheResultados(int(presupuesto_mb * 1024 * 1024))
+
+
+def clave_filtros(seccion, version, categorias, fecha_ini, fecha_fin, *extra):
+    # Clave normalizada: el orden de selección de categorías no importa.
+    # `seccion` separa los distintos tipos de resultado que comparten el cache.
+    return (seccion, version, tuple(sorted(categorias)), str(fecha_ini), str(fecha_fin)) + extra
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Segmentación RFM (recencia, frecuencia y monto) de los clientes de BikeStore.
+
+Por versión de los datos se arma una sola vez la tabla de pedidos por cliente
+(pedido x categoría, ordenada por fecha). Cada filtro de fechas y categorías se
+resuelve sobre esa tabla con un slice y conteos por cliente (bincount), sin volver
+a las líneas de pedido.
+
+@author: elias
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from datos import CARPETA_DATOS, ARCHIVOS_CLIENTES, VERSIONES_EN_MEMORIA, version_datos, leer_tabla, congelar
+from paralelo import mapear_particiones
+from periodos import dias_desde_fechas
+
+# Cortes de los puntajes 1-5 (quintiles)
+CUANTILES = [0.2, 0.4, 0.6, 0.8]
+
+# Segmentos en orden de prioridad: se asigna el primero cuya regla cumple el cliente.
+# `r` es el puntaje de recencia y `fm` el promedio de los de frecuencia y monto.
+SEGMENTOS = [
+    ("Campeones", lambda r, fm: (r >= 4) & (fm >= 4)),
+    ("Leales", lambda r, fm: (r >= 3) & (fm >= 3)),
+    ("Nuevos / prometedores", lambda r, fm: r >= 4),
+    ("En riesgo", lambda r, fm: (r <= 2) & (fm >= 3)),
+    ("Hibernando", lambda r, fm: r <= 2),
+]
+SEGMENTO_RESTO = "Necesitan atención"
+NOMBRES_SEGMENTOS = [nombre for nombre, _ in SEGMENTOS] + [SEGMENTO_RESTO]
+
+# Clientes del ranking por monto
+FILAS_TOP_CLIENTES = 15
+
+
+def version_clientes(carpeta=CARPETA_DATOS):
+    return version_datos(carpeta, ARCHIVOS_CLIENTES)
+
+
+# ============================================
+# PEDIDOS POR CLIENTE (UNA VEZ POR VERSIÓN)
+# ============================================
+def _pedidos_tramo(hechos):
+    return (
+        hechos
+        .groupby(["order_date", "order_id", "category_id"], sort=True)
+        .agg(customer_id=("customer_id", "first"), total=("total", "sum"))
+        .reset_index()
+    )
+
+
+def pedidos_desde_hechos(hechos):
+    # Una fila por pedido y categoría. Un pedido tiene una sola fecha, así que los
+    # tramos mensuales no comparten pedidos y los parciales solo se concatenan.
+    partes = mapear_particiones(_pedidos_tramo, hechos)
+    return partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
+
+
+def base_desde_pedidos(pedidos, customers):
+    # Pedidos con el cliente como posición en la tabla de clientes y la fecha como día
+    clientes = customers.sort_values("customer_id", ignore_index=True)
+    ids = clientes["customer_id"].to_numpy()
+    posicion = np.minimum(np.searchsorted(ids, pedidos["customer_id"].to_numpy()), max(len(ids) - 1, 0))
+    conocidos = ids[posicion] == pedidos["customer_id"].to_numpy()
+    dias = dias_desde_fechas(pd.to_datetime(pedidos["order_date"]))
+    return {
+        "pedidos": pd.DataFrame({
+            "cliente": posicion[conocidos].astype(np.int32),
+            "order_id": pedidos["order_id"].to_numpy()[conocidos],
+            "dia": dias[conocidos],
+            "category_id": pedidos["category_id"].to_numpy()[conocidos],
+            "total": pedidos["total"].to_numpy(dtype=np.float64)[conocidos],
+        }),
+        # Nombres y ciudades quedan categóricos: el texto solo se arma para los clientes que se muestran
+        "clientes": clientes[["customer_id", "first_name", "last_name", "city", "state"]],
+    }
+
+
+@st.cache_resource(max_entries=VERSIONES_EN_MEMORIA)
+def construir_base_clientes(_leer_pedidos, version, carpeta=CARPETA_DATOS):
+    # `_leer_pedidos` (sin hashear) devuelve los pedidos por cliente de la versión vigente;
+    # la clave del cache la dan `version` (ventas + clientes) y la carpeta
+    return congelar(base_desde_pedidos(_leer_pedidos(), leer_tabla("customers", carpeta)))
+
+
+# ============================================
+# RFM DE UN FILTRO
+# ============================================
+def _quintil(valores):
+    # Puntaje 1-5; los empates con un corte quedan en el quintil inferior
+    cortes = np.quantile(valores, CUANTILES)
+    return (np.searchsorted(cortes, valores, side="left") + 1).astype(np.int8)
+
+
+def segmentar(r, fm):
+    condiciones = [regla(r, fm) for _, regla in SEGMENTOS]
+    return np.select(condiciones, np.arange(len(SEGMENTOS)), default=len(SEGMENTOS))
+
+
+def calcular_rfm(base, categoria_ids, fecha_ini, fecha_fin):
+    # Recencia (días desde la última compra hasta fecha_fin), frecuencia (pedidos) y
+    # monto de cada cliente con compras en el filtro, y sus segmentos
+    pedidos = base["pedidos"]
+    dias = pedidos["dia"].to_numpy()
+    dia_fin = int(dias_desde_fechas(fecha_fin))
+    ini = np.searchsorted(dias, int(dias_desde_fechas(fecha_ini)), side="left")
+    fin = np.searchsorted(dias, dia_fin, side="right")
+    seleccion = np.isin(pedidos["category_id"].to_numpy()[ini:fin], np.asarray(categoria_ids))
+    cliente = pedidos["cliente"].to_numpy()[ini:fin][seleccion]
+    pedido = pedidos["order_id"].to_numpy()[ini:fin][seleccion]
+    dia = dias[ini:fin][seleccion]
+    total = pedidos["total"].to_numpy()[ini:fin][seleccion]
+
+    num_clientes = len(base["clientes"])
+    monto = np.bincount(cliente, weights=total, minlength=num_clientes)
+    # Las filas de un mismo pedido (una por categoría) son contiguas: se cuenta la primera
+    primera = np.ones(len(pedido), dtype=bool)
+    primera[1:] = pedido[1:] != pedido[:-1]
+    frecuencia = np.bincount(cliente[primera], minlength=num_clientes)
+    ultima = np.full(num_clientes, np.iinfo(np.int32).min, dtype=np.int32)
+    np.maximum.at(ultima, cliente, dia)
+
+    activos = np.flatnonzero(frecuencia)
+    resumen = {
+        "clientes": num_clientes,
+        "activos": len(activos),
+        "recompra": float((frecuencia[activos] > 1).mean()) if len(activos) else 0.0,
+        "monto_medio": float(monto[activos].mean()) if len(activos) else 0.0,
+        "recencia_mediana": float(np.median(dia_fin - ultima[activos])) if len(activos) else 0.0,
+    }
+    if not len(activos):
+        vacio = pd.DataFrame()
+        return dict(resumen, segmentos=vacio, top_clientes=vacio)
+
+    r = dia_fin - ultima[activos]
+    f = frecuencia[activos]
+    m = monto[activos]
+    puntaje_r = 6 - _quintil(r)
+    puntaje_f = _quintil(f)
+    puntaje_m = _quintil(m)
+    segmento = segmentar(puntaje_r, (puntaje_f + puntaje_m + 1) // 2)
+
+    # Resumen por segmento con conteos y sumas ponderadas (una pasada por métrica)
+    n = len(NOMBRES_SEGMENTOS)
+    clientes_segmento = np.bincount(segmento, minlength=n)
+    ventas_segmento = np.bincount(segmento, weights=m, minlength=n)
+    con_clientes = clientes_segmento > 0
+    denominador = np.maximum(clientes_segmento, 1)
+    segmentos = pd.DataFrame(
+        {
+            "Clientes": clientes_segmento,
+            "% Clientes": clientes_segmento / len(activos) * 100,
+            "Recencia media (días)": np.bincount(segmento, weights=r, minlength=n) / denominador,
+            "Pedidos por cliente": np.bincount(segmento, weights=f, minlength=n) / denominador,
+            "Monto medio": ventas_segmento / denominador,
+            "Ventas": ventas_segmento,
+            "% Ventas": ventas_segmento / max(m.sum(), 1e-9) * 100,
+        },
+        index=pd.Index(NOMBRES_SEGMENTOS, name="Segmento"),
+    )[con_clientes]
+
+    # Mayores montos: solo los elegidos se ordenan y se unen a sus nombres
+    k = min(FILAS_TOP_CLIENTES, len(m))
+    elegidos = np.argpartition(-m, k - 1)[:k]
+    elegidos = elegidos[np.argsort(-m[elegidos], kind="stable")]
+    datos_clientes = base["clientes"].iloc[activos[elegidos]]
+    top_clientes = pd.DataFrame({
+        "Cliente": (datos_clientes["first_name"].astype(str) + " " + datos_clientes["last_name"].astype(str)).to_numpy(),
+        "Ciudad": (datos_clientes["city"].astype(str) + ", " + datos_clientes["state"].astype(str)).to_numpy(),
+        "Recencia (días)": r[elegidos],
+        "Pedidos": f[elegidos],
+        "Monto": m[elegidos],
+        "RFM": [f"{a}{b}{c}" for a, b, c in zip(puntaje_r[elegidos], puntaje_f[elegidos], puntaje_m[elegidos])],
+        "Segmento": np.asarray(NOMBRES_SEGMENTOS, dtype=object)[segmento[elegidos]],
+    })
+    return dict(resumen, segmentos=segmentos, top_clientes=top_clientes)
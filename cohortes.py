@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Cohortes de clientes por mes de primera compra: retención y ventas por meses
+transcurridos desde la primera compra.
+
+Los meses se manejan como enteros consecutivos (la clave de mes de periodos.py) y las
+matrices se acumulan con bincount sobre celdas (cohorte, mes calendario), sin groupby
+ni pivots.
+
+@author: elias
+"""
+
+import numpy as np
+import pandas as pd
+
+from periodos import claves_periodo, dias_desde_fechas, etiquetas_periodo, meses_desde_aaaamm
+
+# Marca de "sin compras" en primer_mes (mayor que cualquier mes, para np.minimum)
+SIN_COMPRAS = np.iinfo(np.int32).max
+
+MEDIDAS = {
+    "Retención (% de la cohorte)": "retencion",
+    "Clientes activos": "clientes",
+    "Ventas (S/)": "ventas",
+    "Ventas acumuladas por cliente (S/)": "ventas_por_cliente",
+}
+
+
+def _mes_de_fecha(fecha):
+    return int(claves_periodo(dias_desde_fechas(fecha), "mes"))
+
+
+# ============================================
+# MATRICES COHORTE x MES CALENDARIO
+# ============================================
+def cohortes_desde_hechos(hechos, previo=None, desde=None):
+    # `hechos` necesita customer_id, mes (AAAAMM) y total, ordenado por mes.
+    # clientes[c, m] / ventas[c, m]: clientes distintos y ventas en el mes m de los clientes
+    # cuya primera compra fue en el mes c (ambos relativos a `mes_base`).
+    # Con `previo` y `desde` (ingesta incremental) se conservan los meses anteriores al
+    # de `desde` y solo se acumulan las filas desde el inicio de ese mes.
+    meses = meses_desde_aaaamm(hechos["mes"].to_numpy())
+    mes_base = int(meses[0])
+    k = 0
+    if previo is not None and desde is not None and _mes_de_fecha(desde) >= previo["mes_base"]:
+        mes_base = previo["mes_base"]
+        k = _mes_de_fecha(desde) - mes_base
+    else:
+        previo = None
+    num_meses = int(meses[-1]) - mes_base + 1
+
+    inicio_cola = np.searchsorted(meses, mes_base + k, side="left")
+    cliente = hechos["customer_id"].to_numpy()[inicio_cola:].astype(np.int64)
+    mes = (meses[inicio_cola:] - mes_base).astype(np.int32)
+    total = hechos["total"].to_numpy()[inicio_cola:]
+
+    # Mes de primera compra indexado por customer_id (los ids se usan como posición)
+    largo = int(cliente.max()) + 1 if len(cliente) else 0
+    if previo is not None:
+        largo = max(largo, len(previo["primer_mes"]))
+    primer_mes = np.full(largo, SIN_COMPRAS, dtype=np.int32)
+    if previo is not None:
+        primer_mes[:len(previo["primer_mes"])] = previo["primer_mes"]
+    np.minimum.at(primer_mes, cliente, mes)
+
+    celda = primer_mes[cliente].astype(np.int64) * num_meses + mes
+    ventas = np.bincount(celda, weights=total, minlength=num_meses * num_meses).reshape(num_meses, num_meses)
+
+    # Un cliente cuenta una vez por mes: bitmap de clientes vistos en cada mes (las filas
+    # de un mes son contiguas), más barato que ordenar todos los pares (cliente, mes)
+    clientes = np.zeros((num_meses, num_meses), dtype=np.int64)
+    visto = np.zeros(largo, dtype=bool)
+    limites = np.searchsorted(mes, np.arange(k, num_meses + 1))
+    for m, (ini, fin) in enumerate(zip(limites[:-1], limites[1:]), start=k):
+        visto[cliente[ini:fin]] = True
+        unicos = np.flatnonzero(visto)
+        clientes[:, m] = np.bincount(primer_mes[unicos], minlength=num_meses)
+        visto[unicos] = False
+
+    if previo is not None:
+        filas = min(previo["num_meses"], num_meses)
+        columnas = min(k, previo["num_meses"])
+        ventas[:filas, :columnas] = previo["ventas"][:filas, :columnas]
+        clientes[:filas, :columnas] = previo["clientes"][:filas, :columnas]
+
+    return {
+        "mes_base": mes_base,
+        "num_meses": num_meses,
+        "primer_mes": primer_mes,
+        "clientes": clientes,
+        "ventas": ventas,
+    }
+
+
+# ============================================
+# VISTA COHORTE x MESES DESDE LA PRIMERA COMPRA
+# ============================================
+def matriz_cohortes(cohortes, fecha_ini, fecha_fin, meses_max, medida="retencion"):
+    # Cohortes con primera compra entre fecha_ini y fecha_fin (filas) por meses desde la
+    # primera compra 0..meses_max (columnas); vacío lo que cae después de fecha_fin.
+    # Devuelve la matriz y el tamaño de cada cohorte.
+    mes_base, num_meses = cohortes["mes_base"], cohortes["num_meses"]
+    primera = max(_mes_de_fecha(fecha_ini) - mes_base, 0)
+    ultima = min(_mes_de_fecha(fecha_fin) - mes_base, num_meses - 1)
+    filas = np.arange(primera, ultima + 1)
+    tamano = cohortes["clientes"][filas, filas]
+    filas, tamano = filas[tamano > 0], tamano[tamano > 0]
+
+    # Desplazamiento de cada fila: columna = cohorte + meses transcurridos
+    columnas = filas[:, None] + np.arange(meses_max + 1)[None, :]
+    visibles = columnas <= ultima
+    columnas = np.minimum(columnas, num_meses - 1)
+    clientes = np.where(visibles, cohortes["clientes"][filas[:, None], columnas], np.nan)
+    ventas = np.where(visibles, cohortes["ventas"][filas[:, None], columnas], np.nan)
+
+    valores = {
+        "retencion": clientes / tamano[:, None],
+        "clientes": clientes,
+        "ventas": ventas,
+        "ventas_por_cliente": np.where(visibles, np.nancumsum(ventas, axis=1), np.nan) / tamano[:, None],
+    }[medida]
+    indice = etiquetas_periodo(filas + mes_base, "mes").rename("Cohorte")
+    matriz = pd.DataFrame(valores, index=indice, columns=[f"Mes {i}" for i in range(meses_max + 1)])
+    return matriz, pd.Series(tamano, index=indice, name="Clientes nuevos")
@@ -8,11 +8,15 @@ Created on Mon Nov 17 16:30:26 2025
 ###########
 # Manera creativa: Dashboard web con Streamlit
 import streamlit as st
-import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 import numpy as np
 
+from datos import version_datos
+from reportes import REPORTES
+from graficos import grafico_ventas_periodo
+from periodos import GRANULARIDADES, ventas_por_periodo
+
 # ============================================
 # CONFIGURACIÓN GENERAL
 # ============================================
@@ -24,118 +28,110 @@ st.markdown(
 )
 
 # ============================================
-# CARGA DE DATOS (solo desde archivos del repo)
+# GRAFO DE REPORTES (snapshot columnar de los CSV del repo)
 # ============================================
 
-products = pd.read_csv("products.csv")
-order_items = pd.read_csv("order_items.csv")
-orders = pd.read_csv("orders.csv")
-categories = pd.read_csv("categories.csv")
-staffs = pd.read_csv("staffs.csv")
+# Cada reporte es un nodo de reportes.py: solo se calculan los reportes en pantalla y
+# sus insumos (líneas con importe, joins con productos u órdenes), una vez por versión
+reportes = REPORTES.evaluador(version_datos())
 
-# ============================================
-# ARREGLO DE COLUMNAS DUPLICADAS
-# ============================================
-order_items = order_items.rename(columns={"list_price": "list_price_order"})
-products = products.rename(columns={"list_price": "list_price_product"})
+TITULOS_REPORTES = {
+    "ventas_categoria": "1️⃣ Ventas por Categoría",
+    "ventas_diarias": "2️⃣ Evolución de Ventas",
+    "top_productos": "3️⃣ Top 10 Productos Más Vendidos",
+    "ventas_vendedores": "4️⃣ Vendedores con Más Ventas",
+}
+visibles = st.sidebar.multiselect(
+    "Reportes en pantalla",
+    options=list(TITULOS_REPORTES),
+    default=list(TITULOS_REPORTES),
+    format_func=TITULOS_REPORTES.get,
+)
 
 # ============================================
 # KPI PRINCIPALES
 # ============================================
-order_items["total"] = order_items["quantity"] * order_items["list_price_order"] * (1 - order_items["discount"])
-ventas_totales = order_items["total"].sum()
-num_ordenes = orders["order_id"].nunique()
-num_productos = products["product_id"].nunique()
+kpis = reportes["kpis"]
 
 col1, col2, col3 = st.columns(3)
-col1.metric("💰 Ventas Totales", f"S/ {ventas_totales:,.0f}")
-col2.metric("📦 Total de Órdenes", f"{num_ordenes:,}")
-col3.metric("🚲 Productos en Catálogo", f"{num_productos:,}")
+col1.metric("💰 Ventas Totales", f"S/ {kpis['ventas_totales']:,.0f}")
+col2.metric("📦 Total de Órdenes", f"{kpis['num_ordenes']:,}")
+col3.metric("🚲 Productos en Catálogo", f"{kpis['num_productos']:,}")
 
 # ============================================
 # REPORTE 1: Ventas por Categoría
 # ============================================
 
-st.header("1️⃣ Ventas por Categoría")
+if "ventas_categoria" in visibles:
+    st.header(TITULOS_REPORTES["ventas_categoria"])
 
-merged = order_items.merge(products, on="product_id").merge(categories, on="category_id")
-merged["total"] = merged["quantity"] * merged["list_price_order"] * (1 - merged["discount"])
+    ventas_categoria = reportes["ventas_categoria"]
 
-ventas_categoria = merged.groupby("category_name")["total"].sum().sort_values(ascending=False)
+    fig1, ax1 = plt.subplots(figsize=(10, 5))
+    colors = plt.cm.Blues(np.linspace(0.4, 0.9, len(ventas_categoria)))
 
-fig1, ax1 = plt.subplots(figsize=(10, 5))
-colors = plt.cm.Blues(np.linspace(0.4, 0.9, len(ventas_categoria)))
+    ventas_categoria.plot(kind="bar", ax=ax1, color=colors)
+    ax1.set_title("Ventas por Categoría de Producto")
+    ax1.set_ylabel("Ventas Totales (S/.)")
+    ax1.yaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"S/ {x:,.0f}"))
+    plt.xticks(rotation=45)
+    plt.tight_layout()
 
-ventas_categoria.plot(kind="bar", ax=ax1, color=colors)
-ax1.set_title("Ventas por Categoría de Producto")
-ax1.set_ylabel("Ventas Totales (S/.)")
-ax1.yaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"S/ {x:,.0f}"))
-plt.xticks(rotation=45)
-plt.tight_layout()
-
-st.pyplot(fig1)
+    st.pyplot(fig1)
 
 # ============================================
-# REPORTE 2: Ventas Mensuales
+# REPORTE 2: Evolución de Ventas
 # ============================================
 
-st.header("2️⃣ Ventas Mensuales")
-
-orders["order_date"] = pd.to_datetime(orders["order_date"])
-ventas_mes = order_items.merge(orders, on="order_id")
-ventas_mes["total"] = ventas_mes["quantity"] * ventas_mes["list_price_order"] * (1 - ventas_mes["discount"])
-ventas_mes["mes"] = ventas_mes["order_date"].dt.to_period("M").astype(str)
+if "ventas_diarias" in visibles:
+    st.header(TITULOS_REPORTES["ventas_diarias"])
 
-ventas_mensuales = ventas_mes.groupby("mes")["total"].sum()
+    # Cambiar de granularidad reagrupa los días (enteros) del nodo, sin volver a las fechas
+    granularidad = GRANULARIDADES[
+        st.radio("Granularidad:", options=list(GRANULARIDADES), index=list(GRANULARIDADES).index("Mes"), horizontal=True)
+    ]
+    ventas_periodo = ventas_por_periodo(reportes["ventas_diarias"], granularidad)
 
-fig2, ax2 = plt.subplots(figsize=(10, 5))
-ax2.plot(ventas_mensuales.index, ventas_mensuales.values, marker="o", linewidth=3)
-ax2.set_title("Evolución Mensual de Ventas")
-ax2.set_ylabel("Ventas Totales (S/.)")
-ax2.yaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"S/ {x:,.0f}"))
-plt.xticks(rotation=45)
-plt.tight_layout()
-
-st.pyplot(fig2)
+    # Mismo gráfico (y mismo cache de imágenes) que la Evolución de Ventas de app.py
+    st.image(grafico_ventas_periodo(ventas_periodo, granularidad), width="stretch")
 
 # ============================================
 # REPORTE 3: Top 10 Productos
 # ============================================
 
-st.header("3️⃣ Top 10 Productos Más Vendidos")
+if "top_productos" in visibles:
+    st.header(TITULOS_REPORTES["top_productos"])
 
-top_prod = merged.groupby("product_name")["total"].sum().sort_values(ascending=False).head(10)
+    top_prod = reportes["top_productos"]
 
-fig3, ax3 = plt.subplots(figsize=(10, 5))
-colors = plt.cm.Greens(np.linspace(0.3, 0.9, len(top_prod)))
+    fig3, ax3 = plt.subplots(figsize=(10, 5))
+    colors = plt.cm.Greens(np.linspace(0.3, 0.9, len(top_prod)))
 
-top_prod.plot(kind="bar", color=colors, ax=ax3)
-ax3.set_title("Top 10 Productos Más Vendidos")
-ax3.set_ylabel("Ingresos Totales (S/.)")
-ax3.yaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"S/ {x:,.0f}"))
-plt.xticks(rotation=45)
-plt.tight_layout()
+    top_prod.plot(kind="bar", color=colors, ax=ax3)
+    ax3.set_title("Top 10 Productos Más Vendidos")
+    ax3.set_ylabel("Ingresos Totales (S/.)")
+    ax3.yaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"S/ {x:,.0f}"))
+    plt.xticks(rotation=45)
+    plt.tight_layout()
 
-st.pyplot(fig3)
+    st.pyplot(fig3)
 
 # ============================================
 # REPORTE 4: Ventas por Vendedor
 # ============================================
 
-st.header("4️⃣ Vendedores con Más Ventas")
-
-ventas_vend = orders.merge(staffs, on="staff_id").merge(order_items, on="order_id")
-ventas_vend["total"] = ventas_vend["quantity"] * ventas_vend["list_price_order"] * (1 - ventas_vend["discount"])
+if "ventas_vendedores" in visibles:
+    st.header(TITULOS_REPORTES["ventas_vendedores"])
 
-top_vendedores = ventas_vend.groupby("first_name")["total"].sum().sort_values(ascending=False)
+    top_vendedores = reportes["ventas_vendedores"]
 
-fig4, ax4 = plt.subplots(figsize=(10, 5))
-colors = plt.cm.Oranges(np.linspace(0.4, 0.9, len(top_vendedores)))
+    fig4, ax4 = plt.subplots(figsize=(10, 5))
+    colors = plt.cm.Oranges(np.linspace(0.4, 0.9, len(top_vendedores)))
 
-top_vendedores.plot(kind="barh", color=colors, ax=ax4)
-ax4.set_title("Top Vendedores por Ingresos")
-ax4.set_xlabel("Ingresos Totales (S/.)")
-ax4.xaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"S/ {x:,.0f}"))
-plt.tight_layout()
+    top_vendedores.plot(kind="barh", color=colors, ax=ax4)
+    ax4.set_title("Top Vendedores por Ingresos")
+    ax4.set_xlabel("Ingresos Totales (S/.)")
+    ax4.xaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"S/ {x:,.0f}"))
+    plt.tight_layout()
 
-st.pyplot(fig4)
+    st.pyplot(fig4)
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+Capa de datos compartida por los dashboards de BikeStore.
+
+@author: elias
+"""
+
+import functools
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# ============================================
+# ARCHIVOS DE ORIGEN
+# ============================================
+# Carpeta de los CSV (BIKESTORE_DATOS permite apuntar a datos generados con generar_datos.py)
+CARPETA_DATOS = os.environ.get("BIKESTORE_DATOS", ".")
+
+ARCHIVOS = {
+    "products": "products.csv",
+    "order_items": "order_items.csv",
+    "orders": "orders.csv",
+    "categories": "categories.csv",
+    "staffs": "staffs.csv",
+}
+
+# Inventario: se versiona aparte para que un cambio de stock no invalide la tabla de hechos
+ARCHIVOS_INVENTARIO = {
+    "stocks": "stocks.csv",
+    "stores": "stores.csv",
+}
+
+# Clientes: también aparte (las altas de clientes no afectan a las ventas ya cargadas)
+ARCHIVOS_CLIENTES = {
+    "customers": "customers.csv",
+}
+
+# Todas las tablas que se pueden leer con leer_tabla
+TODOS_LOS_ARCHIVOS = {**ARCHIVOS, **ARCHIVOS_INVENTARIO, **ARCHIVOS_CLIENTES}
+
+# Arreglo de columnas duplicadas (list_price existe en products y en order_items)
+RENOMBRES = {
+    "order_items": {"list_price": "list_price_order"},
+    "products": {"list_price": "list_price_product"},
+}
+
+# Columnas de cada tabla que llegan a la tabla de hechos (el resto no lo usa ningún dashboard)
+COLUMNAS_JOIN = {
+    "order_items": ["order_id", "product_id", "quantity", "list_price_order", "discount"],
+    "products": ["product_id", "product_name", "category_id"],
+    "categories": ["category_id", "category_name"],
+    "orders": ["order_id", "customer_id", "order_date", "staff_id", "store_id"],
+    "staffs": ["staff_id", "first_name", "last_name"],
+}
+
+# Ids y cantidades se guardan con el entero más chico que los contiene
+COLUMNAS_ENTERAS = ["order_id", "product_id", "category_id", "customer_id", "staff_id", "store_id", "quantity"]
+
+# Snapshot columnar (.npz comprimido por tabla) que evita parsear los CSV en cada arranque
+CARPETA_SNAPSHOT = ".snapshot"
+
+# Versiones de los CSV que se mantienen en memoria compartida (la vigente y la anterior)
+VERSIONES_EN_MEMORIA = 2
+
+
+def version_datos(carpeta=CARPETA_DATOS, archivos=ARCHIVOS):
+    # Huella de los CSV (mtime + tamaño): cambia en cuanto se modifica cualquier archivo
+    huella = []
+    for nombre, archivo in archivos.items():
+        info = os.stat(os.path.join(carpeta, archivo))
+        huella.append((nombre, info.st_mtime_ns, info.st_size))
+    return tuple(huella)
+
+
+# ============================================
+# SNAPSHOT COLUMNAR DE LOS CSV
+# ============================================
+def _huella_archivo(ruta):
+    info = os.stat(ruta)
+    return np.array([info.st_mtime_ns, info.st_size], dtype=np.int64)
+
+
+def _guardar_snapshot(df, ruta, huella):
+    # Cada columna se guarda tipada: fechas como datetime64, números tal cual,
+    # textos como categórico (códigos + categorías) para no depender de pickle
+    arrays = {"__columnas__": np.array(df.columns, dtype=np.str_), "__huella__": huella}
+    for i, col in enumerate(df.columns):
+        serie = df[col]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            arrays[f"fecha_{i}"] = serie.to_numpy(dtype="datetime64[ns]")
+        elif pd.api.types.is_numeric_dtype(serie):
+            arrays[f"num_{i}"] = serie.to_numpy()
+        else:
+            cat = pd.Categorical(serie)
+            arrays[f"cod_{i}"] = cat.codes
+            arrays[f"cat_{i}"] = np.array(cat.categories, dtype=np.str_)
+
+    # Temporal único en la misma carpeta (varios procesos o hilos pueden regenerar a la vez)
+    # y reemplazo atómico: nunca se lee un snapshot a medio escribir
+    carpeta = os.path.dirname(ruta)
+    os.makedirs(carpeta, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, suffix=".tmp.npz")
+    try:
+        with os.fdopen(descriptor, "wb") as archivo:
+            np.savez_compressed(archivo, **arrays)
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+
+def _leer_snapshot(ruta, huella):
+    # Devuelve None si no existe, si el CSV de origen cambió desde que se generó o si no se
+    # puede leer (truncado o de un formato anterior): en esos casos se regenera desde el CSV
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with np.load(ruta) as npz:
+            if not np.array_equal(npz["__huella__"], huella):
+                return None
+            datos = {}
+            for i, col in enumerate(npz["__columnas__"]):
+                if f"fecha_{i}" in npz:
+                    datos[col] = npz[f"fecha_{i}"]
+                elif f"num_{i}" in npz:
+                    datos[col] = npz[f"num_{i}"]
+                else:
+                    datos[col] = pd.Categorical.from_codes(npz[f"cod_{i}"], categories=npz[f"cat_{i}"])
+    except (OSError, EOFError, zipfile.BadZipFile, KeyError, ValueError):
+        return None
+    return pd.DataFrame(datos)
+
+
+def tipar_tabla(df):
+    # Fechas parseadas y textos como categóricos (mismo tipado que el snapshot)
+    for col in df.columns:
+        if col.endswith("_date"):
+            df[col] = pd.to_datetime(df[col])
+        elif not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def leer_tabla(nombre, carpeta=CARPETA_DATOS):
+    # Lee la tabla desde el snapshot; solo se parsea el CSV si el snapshot falta o está desactualizado
+    ruta_csv = os.path.join(carpeta, TODOS_LOS_ARCHIVOS[nombre])
+    ruta_snapshot = os.path.join(carpeta, CARPETA_SNAPSHOT, f"{nombre}.npz")
+    huella = _huella_archivo(ruta_csv)
+
+    df = _leer_snapshot(ruta_snapshot, huella)
+    if df is not None:
+        return df
+
+    df = tipar_tabla(pd.read_csv(ruta_csv))
+    try:
+        _guardar_snapshot(df, ruta_snapshot, huella)
+    except OSError:
+        # Carpeta de solo lectura: se sigue trabajando con el CSV parseado
+        pass
+    return df
+
+
+# ============================================
+# TABLAS COMPARTIDAS DE SOLO LECTURA
+# ============================================
+# Métodos con `inplace=True`: en la tabla compartida lanzan TypeError antes de tocar nada
+METODOS_INPLACE = (
+    "rename", "rename_axis", "set_index", "reset_index", "fillna", "ffill", "bfill", "replace",
+    "interpolate", "sort_values", "sort_index", "drop", "dropna", "drop_duplicates",
+    "where", "mask", "clip", "query", "eval",
+)
+
+
+class TablaSoloLectura(pd.DataFrame):
+    # DataFrame compartido entre sesiones: sus arrays son de solo lectura (escribir con
+    # .loc/.iloc lanza ValueError) y agregar, reemplazar o borrar columnas o filas,
+    # reasignar `columns`/`index` o sus nombres o usar `inplace=True` lanza TypeError (o el
+    # RuntimeError de pandas al nombrar un eje) sin modificar la tabla.
+    # Lo que se deriva de ella (slices, filtros, merges, copias) es un DataFrame normal que
+    # comparte los datos hasta que se modifica (copy-on-write).
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    def _solo_lectura(self, *args, **kwargs):
+        raise TypeError("Tabla compartida de solo lectura: modifique una copia (df.copy() o df.assign(...))")
+
+    __setitem__ = __delitem__ = insert = isetitem = update = _update_inplace = _set_axis = _solo_lectura
+
+    # El manager se asigna una sola vez, al construir la tabla: pandas lo reemplaza al
+    # agregar filas o columnas con .loc/.iloc
+    @property
+    def _mgr(self):
+        return self.__dict__["_mgr"]
+
+    @_mgr.setter
+    def _mgr(self, mgr):
+        if "_mgr" in self.__dict__:
+            self._solo_lectura()
+        self.__dict__["_mgr"] = mgr
+
+    def _eje(nombre, asignar=_solo_lectura):
+        # Vista del eje (mismos datos y mismo motor de búsqueda) a la que no se le puede
+        # asignar `name`; si se cambian sus `names`, cambia la vista y no la tabla
+        def leer(self):
+            eje = getattr(pd.DataFrame, nombre).__get__(self, pd.DataFrame)._view()
+            eje._no_setting_name = True
+            return eje
+
+        return property(leer, asignar)
+
+    columns = _eje("columns")
+    index = _eje("index")
+    del _eje
+
+    def _set_axis_nocheck(self, labels, axis, inplace):
+        if inplace:
+            self._solo_lectura()
+        return pd.DataFrame._set_axis_nocheck(self, labels, axis, inplace)
+
+
+def _sin_inplace(nombre):
+    metodo = getattr(pd.DataFrame, nombre)
+
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        if kwargs.get("inplace"):
+            self._solo_lectura()
+        return metodo(self, *args, **kwargs)
+
+    return envoltura
+
+
+for _nombre in METODOS_INPLACE:
+    setattr(TablaSoloLectura, _nombre, _sin_inplace(_nombre))
+
+
+def _array_solo_lectura(array):
+    array.flags.writeable = False
+    return array
+
+
+def congelar(valor):
+    # Versión de solo lectura (sin copiar datos) de tablas, arrays y dicts/tuplas de ellos
+    if isinstance(valor, pd.DataFrame):
+        columnas = {}
+        for col in valor.columns:
+            serie = valor[col]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                codigos = _array_solo_lectura(serie.cat.codes.to_numpy())
+                columnas[col] = pd.Categorical.from_codes(codigos, dtype=serie.dtype)
+            else:
+                columnas[col] = _array_solo_lectura(serie.to_numpy())
+        return TablaSoloLectura(columnas, index=valor.index, copy=False)
+    if isinstance(valor, np.ndarray):
+        return _array_solo_lectura(valor)
+    if isinstance(valor, dict):
+        return {clave: congelar(v) for clave, v in valor.items()}
+    if isinstance(valor, tuple):
+        return tuple(congelar(v) for v in valor)
+    return valor
+
+
+# ============================================
+# CARGA DE DATOS CON CACHE
+# ============================================
+def leer_tablas(carpeta=CARPETA_DATOS):
+    products = leer_tabla("products", carpeta)
+    order_items = leer_tabla("order_items", carpeta)
+    orders = leer_tabla("orders", carpeta)
+    categories = leer_tabla("categories", carpeta)
+    staffs = leer_tabla("staffs", carpeta)
+
+    # Arreglo de columnas duplicadas
+    order_items = order_items.rename(columns=RENOMBRES["order_items"])
+    products = products.rename(columns=RENOMBRES["products"])
+
+    return products, order_items, orders, categories, staffs
+
+
+@st.cache_resource(max_entries=VERSIONES_EN_MEMORIA)
+def load_data(carpeta=CARPETA_DATOS, version=None):
+    # Una sola copia por proceso, de solo lectura y sin copiar en cada rerun.
+    # `version` solo participa en la clave del cache.
+    return congelar(leer_tablas(carpeta))
+
+
+# ============================================
+# TABLA DE HECHOS (JOIN COMPLETO) CON CACHE
+# ============================================
+def unir_hechos(products, order_items, orders, categories, staffs):
+    # Join de líneas de pedido con sus dimensiones, ordenado por fecha y con tipos compactos:
+    # solo las columnas en COLUMNAS_JOIN, ids enteros chicos, textos categóricos y el mes
+    # como entero AAAAMM. También se usa para unir solo las líneas nuevas en la ingesta incremental.
+    merged_data = (
+        order_items[COLUMNAS_JOIN["order_items"]]
+        .merge(products[COLUMNAS_JOIN["products"]], on="product_id")
+        .merge(categories[COLUMNAS_JOIN["categories"]], on="category_id")
+        .merge(orders[COLUMNAS_JOIN["orders"]], on="order_id")
+        .merge(staffs[COLUMNAS_JOIN["staffs"]], on="staff_id")
+    )
+    merged_data["total"] = merged_data["quantity"] * merged_data["list_price_order"] * (1 - merged_data["discount"])
+    merged_data = merged_data.drop(columns=["list_price_order", "discount"])
+    merged_data["mes"] = (merged_data["order_date"].dt.year * 100 + merged_data["order_date"].dt.month).astype(np.int32)
+    for col in COLUMNAS_ENTERAS:
+        merged_data[col] = pd.to_numeric(merged_data[col], downcast="integer")
+
+    # Ordenado por fecha: el filtro de rango se resuelve con búsqueda binaria
+    merged_data = merged_data.sort_values("order_date", kind="stable", ignore_index=True)
+
+    return merged_data
+
+
+def memoria_mb(df):
+    # Huella en memoria de una tabla (incluye categorías y textos)
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def etiquetas_mes(meses):
+    # Claves AAAAMM -> "AAAA-MM" para ejes y reportes
+    meses = np.asarray(meses)
+    return pd.Index([f"{mes // 100}-{mes % 100:02d}" for mes in meses], name="mes")
+
+
+@st.cache_resource(max_entries=VERSIONES_EN_MEMORIA)
+def construir_hechos(carpeta=CARPETA_DATOS, version=None):
+    # Se construye una sola vez por versión de los CSV y se comparte entre sesiones
+    return congelar(unir_hechos(*load_data(carpeta, version)))
+
+
+# ============================================
+# APLICAR FILTROS AL DATASET
+# ============================================
+def aplicar_filtros(df, categorias, fecha_ini, fecha_fin, monto_min):
+    # Filtrar por fechas: `df` viene ordenado por order_date, así que el rango
+    # es un slice contiguo (O(log n) y sin copiar)
+    ini = df["order_date"].searchsorted(pd.to_datetime(fecha_ini), side="left")
+    fin = df["order_date"].searchsorted(pd.to_datetime(fecha_fin), side="right")
+    df_filtrado = df.iloc[ini:fin]
+
+    # Filtrar por categorías (solo si no están todas seleccionadas)
+    if not set(df["category_name"].cat.categories) <= set(categorias):
+        df_filtrado = df_filtrado[df_filtrado["category_name"].isin(categorias)]
+
+    return df_filtrado
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Conteo de distintos (órdenes, productos, clientes) sobre rangos de fechas y categorías.
+
+@author: elias
+"""
+
+import numpy as np
+
+from periodos import claves_periodo, dias_desde_fechas, rango_dias, rejilla_dia_categoria
+
+COLUMNAS_DISTINTOS = ["order_id", "product_id", "customer_id"]
+
+# HyperLogLog: 2^12 registros por sketch (error típico ~1.6%)
+PRECISION_HLL = 12
+NUM_REGISTROS = 1 << PRECISION_HLL
+
+
+# ============================================
+# HYPERLOGLOG (VECTORIZADO CON NUMPY)
+# ============================================
+def _hash64(valores):
+    # splitmix64: mezcla suficiente para repartir ids consecutivos entre registros
+    x = valores.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _longitud_bits(x):
+    # Número de bits significativos de cada uint64 (búsqueda binaria vectorizada)
+    x = x.copy()
+    longitud = np.zeros(len(x), dtype=np.int64)
+    for salto in (32, 16, 8, 4, 2, 1):
+        mayor = x >= (np.uint64(1) << np.uint64(salto))
+        longitud[mayor] += salto
+        x[mayor] >>= np.uint64(salto)
+    return longitud + (x > 0)
+
+
+def registros_hll(valores):
+    # Registro destino y rango (posición del primer 1) de cada valor
+    h = _hash64(valores)
+    bits_resto = 64 - PRECISION_HLL
+    registro = (h >> np.uint64(bits_resto)).astype(np.int64)
+    resto = h & np.uint64((1 << bits_resto) - 1)
+    rango = (bits_resto - _longitud_bits(resto) + 1).astype(np.uint8)
+    return registro, rango
+
+
+def estimar_hll(registros):
+    m = NUM_REGISTROS
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimacion = alpha * m * m / np.sum(np.ldexp(1.0, -registros.astype(np.int64)))
+    vacios = np.count_nonzero(registros == 0)
+    if estimacion <= 2.5 * m and vacios > 0:
+        # Corrección para cardinalidades pequeñas (linear counting)
+        estimacion = m * np.log(m / vacios)
+    return int(round(estimacion))
+
+
+# ============================================
+# ÍNDICE DE DISTINTOS POR DÍA Y CATEGORÍA
+# ============================================
+def _meses(inicio, num_dias):
+    # Mes (relativo al de `inicio`) de cada día y límites de cada mes en índices de día
+    meses = claves_periodo(int(dias_desde_fechas(inicio)) + np.arange(num_dias), "mes")
+    mes_de_dia = meses - meses[0]
+    num_meses = int(mes_de_dia[-1]) + 1
+    return mes_de_dia, np.searchsorted(mes_de_dia, np.arange(num_meses + 1))
+
+
+def indices_desde_hechos(hechos, previo=None, desde=None):
+    # Por cada columna, los ids únicos de cada (día, categoría) en formato CSR ordenado
+    # por día (ids + categoría de cada entrada + puntero por día) y sketches HLL por
+    # (categoría, mes) para el modo aproximado. Los ids se usan tal cual como posición
+    # en el bitmap, así que agregar días nuevos no renumera nada.
+    # Con `previo` y `desde` (ingesta incremental) solo se recalculan los días >= desde.
+    rejilla = rejilla_dia_categoria(hechos, previo, desde)
+    if not rejilla["incremental"]:
+        previo = None
+    inicio, num_dias, k, cola = rejilla["inicio"], rejilla["num_dias"], rejilla["k"], rejilla["cola"]
+    mes_de_dia, limites_mes = _meses(inicio, num_dias)
+    num_meses = len(limites_mes) - 1
+    num_categorias = len(rejilla["categoria_ids"])
+    celda = rejilla["dia"].astype(np.int64) * num_categorias + rejilla["fila"]
+
+    indices = {
+        "inicio": inicio,
+        "num_dias": num_dias,
+        "categoria_ids": rejilla["categoria_ids"],
+        "limites_mes": limites_mes,
+        "columnas": {},
+    }
+    for columna in COLUMNAS_DISTINTOS:
+        valores = cola[columna].to_numpy().astype(np.int64)
+        maximo = int(valores.max()) if len(valores) else 0
+        if previo is not None:
+            maximo = max(maximo, previo["columnas"][columna]["maximo"])
+
+        # Pares (día, categoría, id) únicos, ordenados por día, categoría e id
+        pares = np.unique(celda * (maximo + 1) + valores)
+        celda_par = pares // (maximo + 1)
+        ids = pares % (maximo + 1)
+        filas = (celda_par % num_categorias).astype(np.int16)
+        conteo = np.bincount(celda_par // num_categorias - k, minlength=num_dias - k)
+        puntero = np.concatenate([[0], np.cumsum(conteo)])
+
+        if previo is not None:
+            # Se conservan las entradas de los días anteriores a `desde`
+            anterior = previo["columnas"][columna]
+            puntero_previo = np.pad(anterior["puntero"], (0, max(0, k + 1 - len(anterior["puntero"]))), mode="edge")
+            corte = puntero_previo[k]
+            ids = np.concatenate([anterior["ids"][:corte], ids])
+            filas = np.concatenate([anterior["filas"][:corte], filas])
+            puntero = np.concatenate([puntero_previo[:k], puntero + corte])
+
+        # Sketches HLL por (categoría, mes); en modo incremental se rehacen desde el mes de `desde`
+        sketches = np.zeros((num_categorias, num_meses, NUM_REGISTROS), dtype=np.uint8)
+        primer_mes = int(mes_de_dia[k]) if k < num_dias else num_meses
+        if previo is not None:
+            sketches[:, :primer_mes] = previo["columnas"][columna]["sketches"][:, :primer_mes]
+        desde_entrada = puntero[limites_mes[primer_mes]] if primer_mes < num_meses else len(ids)
+        dia_entrada = np.repeat(np.arange(num_dias), np.diff(puntero))[desde_entrada:]
+        registro, rango = registros_hll(ids[desde_entrada:])
+        plano = sketches.reshape(-1)
+        destino = (filas[desde_entrada:].astype(np.int64) * num_meses + mes_de_dia[dia_entrada]) * NUM_REGISTROS
+        np.maximum.at(plano, destino + registro, rango)
+
+        indices["columnas"][columna] = {
+            "maximo": maximo,
+            "ids": ids,
+            "filas": filas,
+            "puntero": puntero,
+            "sketches": sketches,
+        }
+    return indices
+
+
+def _ids_tramo(col, seleccion, desde, hasta):
+    # Ids de los días [desde, hasta) de las categorías seleccionadas (slice contiguo + máscara)
+    tramo = slice(col["puntero"][desde], col["puntero"][hasta])
+    ids = col["ids"][tramo]
+    if not seleccion.all():
+        ids = ids[seleccion[col["filas"][tramo]]]
+    return ids
+
+
+def contar_distintos(indices, columna, categoria_ids, fecha_ini, fecha_fin, aproximado=False):
+    # Exacto: unión de los ids del rango en un bitmap indexado por id.
+    # Aproximado: unión de sketches HLL de los meses completos + bordes parciales.
+    i, j = rango_dias(indices["inicio"], indices["num_dias"], fecha_ini, fecha_fin)
+    seleccion = np.isin(indices["categoria_ids"], categoria_ids)
+    col = indices["columnas"][columna]
+
+    if not aproximado:
+        marcas = np.zeros(col["maximo"] + 1, dtype=bool)
+        marcas[_ids_tramo(col, seleccion, i, j)] = True
+        return int(np.count_nonzero(marcas))
+
+    limites = indices["limites_mes"]
+    primer_mes = np.searchsorted(limites, i, side="left")
+    fin_meses = np.searchsorted(limites, j, side="right") - 1
+    registros = np.zeros(NUM_REGISTROS, dtype=np.uint8)
+    if fin_meses > primer_mes:
+        registros = col["sketches"][seleccion, primer_mes:fin_meses].max(axis=(0, 1), initial=0)
+        bordes = [(i, limites[primer_mes]), (limites[fin_meses], j)]
+    else:
+        bordes = [(i, j)]
+
+    for desde, hasta in bordes:
+        if hasta > desde:
+            registro, rango = registros_hll(_ids_tramo(col, seleccion, desde, hasta))
+            np.maximum.at(registros, registro, rango)
+    return estimar_hll(registros)
+
+
+def calcular_conteos(indices, categoria_ids, fecha_ini, fecha_fin, aproximado=False):
+    # Órdenes, productos y clientes distintos del filtro (los tres KPIs de conteo)
+    return {
+        "num_" + nombre: contar_distintos(indices, columna, categoria_ids, fecha_ini, fecha_fin, aproximado)
+        for nombre, columna in [("ordenes", "order_id"), ("productos", "product_id"), ("clientes", "customer_id")]
+    }
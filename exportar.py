@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Exportación de reportes: generación diferida, CSV por bloques y formatos comprimidos.
+
+@author: elias
+"""
+
+import gzip
+import importlib.util
+import io
+import tempfile
+
+# Filas escritas por bloque al generar CSV (acota la memoria de la exportación)
+FILAS_POR_BLOQUE = 50_000
+
+# Parquet es opcional: solo se ofrece si pyarrow está instalado
+PARQUET_DISPONIBLE = importlib.util.find_spec("pyarrow") is not None
+
+FORMATOS = {
+    "CSV": {"extension": "csv", "mime": "text/csv"},
+    "CSV comprimido (gzip)": {"extension": "csv.gz", "mime": "application/gzip"},
+}
+if PARQUET_DISPONIBLE:
+    FORMATOS["Parquet"] = {"extension": "parquet", "mime": "application/vnd.apache.parquet"}
+
+
+def escribir_csv(df, destino, filas_por_bloque=FILAS_POR_BLOQUE):
+    # Escribe `df` en un archivo de texto bloque a bloque, sin armar el CSV completo en memoria
+    for inicio in range(0, max(len(df), 1), filas_por_bloque):
+        df.iloc[inicio:inicio + filas_por_bloque].to_csv(destino, header=(inicio == 0), index=False)
+
+
+def exportar(df, formato, filas_por_bloque=FILAS_POR_BLOQUE):
+    # Devuelve un archivo temporal (binario, ya rebobinado) con `df` en el formato pedido
+    archivo = tempfile.TemporaryFile()
+    if formato == "CSV":
+        texto = io.TextIOWrapper(archivo, encoding="utf-8", newline="")
+        escribir_csv(df, texto, filas_por_bloque)
+        texto.flush()
+        texto.detach()
+    elif formato == "CSV comprimido (gzip)":
+        with gzip.open(archivo, "wt", encoding="utf-8", newline="") as texto:
+            escribir_csv(df, texto, filas_por_bloque)
+    elif formato == "Parquet" and PARQUET_DISPONIBLE:
+        df.to_parquet(archivo, index=False, compression="zstd")
+    else:
+        archivo.close()
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+    archivo.seek(0)
+    return archivo
+
+
+def descarga_diferida(obtener_df, formato):
+    # Callable sin argumentos para st.download_button (Streamlit >= 1.52): el reporte solo se
+    # arma al descargar, no en cada rerun. El archivo se escribe por bloques, pero Streamlit
+    # sirve la descarga desde bytes en memoria: al pulsar, el archivo completo se lee una vez.
+    def generar():
+        with exportar(obtener_df(), formato) as archivo:
+            return archivo.read()
+    return generar
+
+
+def nombre_archivo(base, formato):
+    return f"{base}.{FORMATOS[formato]['extension']}"
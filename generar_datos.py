@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+Generador de datos sintéticos BikeStore a escala configurable.
+
+Produce los mismos CSV que el dashboard lee (mismo esquema, integridad referencial
+entre tablas) a 1x, 100x, 10.000x... del volumen original. Las filas se escriben
+por bloques, así que la memoria no crece con la escala.
+
+Uso:
+    python generar_datos.py --escala 100 --semilla 42 --salida datos_x100
+
+@author: elias
+"""
+
+import argparse
+import math
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# ============================================
+# PARÁMETROS DE LA GENERACIÓN
+# ============================================
+# Volumen de los CSV originales (escala 1)
+CLIENTES_BASE = 1445
+ORDENES_BASE = 1615
+TIENDAS_BASE = 3
+
+# Filas de órdenes generadas y escritas por bloque
+ORDENES_POR_BLOQUE = 50_000
+
+# Ítems por orden (1 a 5) y descuentos, con la misma distribución que los datos originales
+PROB_ITEMS = [0.18, 0.23, 0.23, 0.21, 0.15]
+DESCUENTOS = [0.05, 0.07, 0.10, 0.20]
+
+# Estados de orden: 1 pendiente, 2 en proceso, 3 rechazada, 4 completada
+DIAS_ORDENES_ABIERTAS = 30
+
+# Dimensiones que se copian tal cual del origen
+TABLAS_COPIADAS = ("categories", "brands")
+
+FORMATO_CSV = {"index": False, "na_rep": "NULL", "lineterminator": "\r\n"}
+
+
+def _rng(semilla, *flujo):
+    # Generador independiente por tabla y bloque: el resultado no depende del orden de escritura
+    return np.random.default_rng([semilla, *flujo])
+
+
+def _escribir(df, ruta, primero):
+    df.to_csv(ruta, mode="w" if primero else "a", header=primero, **FORMATO_CSV)
+
+
+def _precio(precios):
+    # Precios de catálogo terminados en .99
+    return np.maximum(np.round(precios), 1) - 0.01
+
+
+# ============================================
+# DIMENSIONES
+# ============================================
+def generar_productos(plantilla, num_productos, semilla):
+    # Los primeros productos son los originales; el resto son variantes con precio ajustado
+    rng = _rng(semilla, 1)
+    base = plantilla.iloc[np.arange(num_productos) % len(plantilla)].reset_index(drop=True)
+    copia = np.arange(num_productos) // len(plantilla)
+    ajuste = np.where(copia == 0, 1.0, rng.normal(1.0, 0.08, num_productos).clip(0.6, 1.6))
+    nombres = base["product_name"].where(copia == 0, base["product_name"] + " (" + (copia + 1).astype(str) + ")")
+    return pd.DataFrame({
+        "product_id": np.arange(1, num_productos + 1),
+        "product_name": nombres,
+        "brand_id": base["brand_id"],
+        "category_id": base["category_id"],
+        "model_year": base["model_year"],
+        "list_price": np.where(copia == 0, base["list_price"], _precio(base["list_price"] * ajuste)),
+    })
+
+
+def generar_tiendas(plantilla, ubicaciones, num_tiendas, semilla):
+    # Las tiendas originales se conservan; las nuevas toman ciudades reales de los clientes
+    rng = _rng(semilla, 2)
+    nuevas = ubicaciones.iloc[rng.integers(0, len(ubicaciones), max(0, num_tiendas - len(plantilla)))]
+    nuevas = nuevas.reset_index(drop=True)
+    ids = np.arange(len(plantilla) + 1, num_tiendas + 1)
+    ciudad = nuevas["city"].str.lower().str.replace(" ", "", regex=False)
+    nuevas = pd.DataFrame({
+        "store_id": ids,
+        "store_name": nuevas["city"] + " Bikes " + ids.astype(str),
+        "phone": [f"({a}) {b}-{c:04d}" for a, b, c in zip(rng.integers(200, 999, len(ids)), rng.integers(200, 999, len(ids)), rng.integers(0, 10_000, len(ids)))],
+        "email": ciudad + ids.astype(str) + "@bikes.shop",
+        "street": nuevas["street"],
+        "city": nuevas["city"],
+        "state": nuevas["state"],
+        "zip_code": nuevas["zip_code"],
+    })
+    return pd.concat([plantilla.iloc[:num_tiendas], nuevas], ignore_index=True)
+
+
+def generar_personal(tiendas, nombres, apellidos, semilla):
+    # Un gerente general (staff 1) y, por tienda, un gerente + dos vendedores
+    rng = _rng(semilla, 3)
+    num_tiendas = len(tiendas)
+    tienda = np.concatenate([[1], np.repeat(tiendas["store_id"].to_numpy(), 3)])
+    staff_ids = np.arange(1, len(tienda) + 1)
+    gerente_tienda = 2 + 3 * (tienda - 1)
+    manager = np.where(staff_ids == gerente_tienda, 1, gerente_tienda).astype(float)
+    manager[0] = np.nan
+    nombre = nombres[rng.integers(0, len(nombres), len(tienda))]
+    apellido = apellidos[rng.integers(0, len(apellidos), len(tienda))]
+    telefono_tienda = tiendas["phone"].str[:5].to_numpy()[tienda - 1]
+    personal = pd.DataFrame({
+        "staff_id": staff_ids,
+        "first_name": nombre,
+        "last_name": apellido,
+        "email": [f"{n.lower()}.{a.lower()}{i}@bikes.shop" for n, a, i in zip(nombre, apellido, staff_ids)],
+        "phone": [f"{t} 555-{5553 + i:04d}" for t, i in zip(telefono_tienda, staff_ids)],
+        "active": 1,
+        "store_id": tienda,
+        "manager_id": pd.array(manager, dtype="Int64"),
+    })
+    # Vendedores de cada tienda (los que registran las órdenes)
+    vendedores = staff_ids[1:].reshape(num_tiendas, 3)[:, 1:]
+    return personal, vendedores
+
+
+# ============================================
+# TABLAS GRANDES (ESCRITURA POR BLOQUES)
+# ============================================
+def escribir_clientes(ruta, num_clientes, nombres, apellidos, ubicaciones, dominios, semilla):
+    for n, inicio in enumerate(range(0, num_clientes, ORDENES_POR_BLOQUE)):
+        rng = _rng(semilla, 4, n)
+        ids = np.arange(inicio + 1, min(inicio + ORDENES_POR_BLOQUE, num_clientes) + 1)
+        nombre = nombres[rng.integers(0, len(nombres), len(ids))]
+        apellido = apellidos[rng.integers(0, len(apellidos), len(ids))]
+        dominio = dominios[rng.integers(0, len(dominios), len(ids))]
+        lugar = ubicaciones.iloc[rng.integers(0, len(ubicaciones), len(ids))].reset_index(drop=True)
+        telefono = pd.Series([f"({a}) {b}-{c:04d}" for a, b, c in zip(
+            rng.integers(200, 999, len(ids)), rng.integers(200, 999, len(ids)), rng.integers(0, 10_000, len(ids))
+        )]).where(rng.random(len(ids)) < 0.12)
+        bloque = pd.DataFrame({
+            "customer_id": ids,
+            "first_name": nombre,
+            "last_name": apellido,
+            "phone": telefono,
+            "email": [f"{a.lower()}.{b.lower()}{i}@{d}" for a, b, i, d in zip(nombre, apellido, ids, dominio)],
+            "street": rng.integers(1, 10_000, len(ids)).astype(str) + " " + lugar["calle"] + " ",
+            "city": lugar["city"],
+            "state": lugar["state"],
+            "zip_code": lugar["zip_code"],
+        })
+        _escribir(bloque, ruta, n == 0)
+
+
+def _pesos_diarios(dias):
+    # Tendencia creciente, temporada alta en primavera/verano y más ventas el fin de semana
+    t = np.linspace(0, 1, len(dias))
+    temporada = 1 + 0.25 * np.sin(2 * np.pi * (dias.dayofyear.to_numpy() - 100) / 365.25)
+    fin_de_semana = np.where(dias.dayofweek.to_numpy() >= 5, 1.2, 1.0)
+    pesos = (1 + 0.3 * t) * temporada * fin_de_semana
+    return pesos / pesos.sum()
+
+
+def escribir_ordenes(carpeta, num_ordenes, num_clientes, productos, vendedores, fecha_ini, anios, semilla):
+    # orders.csv y order_items.csv a la vez, en bloques de órdenes consecutivas (ordenadas por fecha)
+    dias = pd.date_range(fecha_ini, periods=int(round(365.25 * anios)), freq="D")
+    ordenes_por_dia = _rng(semilla, 5).multinomial(num_ordenes, _pesos_diarios(dias))
+    ultima_orden_dia = np.cumsum(ordenes_por_dia)
+    limite_abiertas = dias[-1] - pd.Timedelta(days=DIAS_ORDENES_ABIERTAS)
+
+    # Popularidad tipo Zipf sobre un ranking aleatorio de productos
+    rng = _rng(semilla, 6)
+    num_productos = len(productos)
+    ranking = rng.permutation(num_productos)
+    popularidad = 1.0 / (np.arange(num_productos) + 10.0) ** 0.8
+    popularidad /= popularidad.sum()
+    salto_max = max(2, min(50, num_productos // len(PROB_ITEMS)))
+    precios = productos["list_price"].to_numpy()
+
+    # Tiendas con peso desigual (como en los datos originales)
+    pesos_tienda = rng.gamma(1.5, size=len(vendedores))
+    pesos_tienda /= pesos_tienda.sum()
+
+    ruta_ordenes = os.path.join(carpeta, "orders.csv")
+    ruta_items = os.path.join(carpeta, "order_items.csv")
+    for n, inicio in enumerate(range(0, num_ordenes, ORDENES_POR_BLOQUE)):
+        rng = _rng(semilla, 7, n)
+        ids = np.arange(inicio + 1, min(inicio + ORDENES_POR_BLOQUE, num_ordenes) + 1)
+        k = len(ids)
+        fecha = dias[np.searchsorted(ultima_orden_dia, ids - 1, side="right")]
+        abierta = fecha > limite_abiertas
+        estado = np.where(
+            abierta,
+            rng.choice([1, 2, 3], size=k, p=[0.45, 0.45, 0.10]),
+            rng.choice([3, 4], size=k, p=[0.03, 0.97]),
+        )
+        envio = pd.Series(fecha + pd.to_timedelta(rng.integers(1, 4, k), unit="D")).where(estado == 4)
+        tienda = rng.choice(len(vendedores), size=k, p=pesos_tienda)
+        staff = vendedores[tienda, rng.integers(0, vendedores.shape[1], k)]
+        ordenes = pd.DataFrame({
+            "order_id": ids,
+            "customer_id": rng.integers(1, num_clientes + 1, k),
+            "order_status": estado,
+            "order_date": fecha,
+            "required_date": fecha + pd.to_timedelta(rng.integers(0, 4, k), unit="D"),
+            "shipped_date": envio,
+            "store_id": tienda + 1,
+            "staff_id": staff,
+        })
+        _escribir(ordenes, ruta_ordenes, n == 0)
+
+        # Ítems: productos distintos dentro de cada orden (saltos positivos sobre el ranking)
+        num_items = rng.choice(np.arange(1, len(PROB_ITEMS) + 1), size=k, p=PROB_ITEMS)
+        total = int(num_items.sum())
+        orden_item = np.repeat(ids, num_items)
+        primero = np.repeat(np.cumsum(num_items) - num_items, num_items)
+        item_id = np.arange(total) - primero + 1
+        salto = rng.integers(1, salto_max, total)
+        salto[primero] = 0
+        desplazamiento = np.cumsum(salto) - np.repeat(np.cumsum(salto)[np.cumsum(num_items) - num_items], num_items)
+        base = np.repeat(rng.choice(num_productos, size=k, p=popularidad), num_items)
+        producto = ranking[(base + desplazamiento) % num_productos]
+        items = pd.DataFrame({
+            "order_id": orden_item,
+            "item_id": item_id,
+            "product_id": producto + 1,
+            "quantity": rng.integers(1, 3, total),
+            "list_price": precios[producto],
+            "discount": rng.choice(DESCUENTOS, size=total),
+        })
+        _escribir(items, ruta_items, n == 0)
+
+
+def escribir_stocks(ruta, num_tiendas, num_productos, semilla):
+    # Una fila por (tienda, producto), escrita tienda a tienda
+    for tienda in range(1, num_tiendas + 1):
+        rng = _rng(semilla, 8, tienda)
+        bloque = pd.DataFrame({
+            "store_id": tienda,
+            "product_id": np.arange(1, num_productos + 1),
+            "quantity": rng.integers(0, 31, num_productos),
+        })
+        _escribir(bloque, ruta, tienda == 1)
+
+
+# ============================================
+# GENERACIÓN COMPLETA
+# ============================================
+def generar(salida, escala=1.0, semilla=0, origen=".", anios=3, fecha_ini="2016-01-01"):
+    # Clientes y órdenes crecen linealmente con la escala; catálogo y tiendas con su raíz
+    os.makedirs(salida, exist_ok=True)
+    num_clientes = max(1, round(CLIENTES_BASE * escala))
+    num_ordenes = max(1, round(ORDENES_BASE * escala))
+    raiz = math.sqrt(escala)
+
+    plantilla_productos = pd.read_csv(os.path.join(origen, "products.csv"))
+    plantilla_tiendas = pd.read_csv(os.path.join(origen, "stores.csv"), dtype={"zip_code": str})
+    clientes = pd.read_csv(os.path.join(origen, "customers.csv"), dtype={"zip_code": str})
+    nombres = clientes["first_name"].unique()
+    apellidos = clientes["last_name"].unique()
+    dominios = clientes["email"].str.split("@").str[1].unique()
+    ubicaciones = clientes[["street", "city", "state", "zip_code"]].assign(
+        calle=clientes["street"].str.strip().str.split(" ", n=1).str[1]
+    )
+
+    productos = generar_productos(plantilla_productos, max(1, round(len(plantilla_productos) * raiz)), semilla)
+    tiendas = generar_tiendas(plantilla_tiendas, ubicaciones, max(1, round(TIENDAS_BASE * raiz)), semilla)
+    personal, vendedores = generar_personal(tiendas, nombres, apellidos, semilla)
+
+    for nombre in TABLAS_COPIADAS:
+        shutil.copyfile(os.path.join(origen, f"{nombre}.csv"), os.path.join(salida, f"{nombre}.csv"))
+    _escribir(productos, os.path.join(salida, "products.csv"), True)
+    _escribir(tiendas, os.path.join(salida, "stores.csv"), True)
+    _escribir(personal, os.path.join(salida, "staffs.csv"), True)
+    escribir_clientes(os.path.join(salida, "customers.csv"), num_clientes, nombres, apellidos, ubicaciones, dominios, semilla)
+    escribir_stocks(os.path.join(salida, "stocks.csv"), len(tiendas), len(productos), semilla)
+    escribir_ordenes(salida, num_ordenes, num_clientes, productos, vendedores, fecha_ini, anios, semilla)
+
+    return {
+        "clientes": num_clientes,
+        "ordenes": num_ordenes,
+        "productos": len(productos),
+        "tiendas": len(tiendas),
+        "personal": len(personal),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera CSV sintéticos de BikeStore a escala.")
+    parser.add_argument("--escala", type=float, default=1.0, help="Factor de escala sobre el volumen original (1, 100, 10000...)")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla: misma semilla, mismos archivos")
+    parser.add_argument("--salida", required=True, help="Carpeta donde se escriben los CSV")
+    parser.add_argument("--origen", default=".", help="Carpeta con los CSV originales usados como plantilla")
+    parser.add_argument("--anios", type=float, default=3, help="Años de historia de órdenes")
+    parser.add_argument("--desde", default="2016-01-01", help="Fecha de la primera orden")
+    args = parser.parse_args()
+
+    resumen = generar(args.salida, args.escala, args.semilla, args.origen, args.anios, args.desde)
+    print(", ".join(f"{clave}: {valor:,}" for clave, valor in resumen.items()))
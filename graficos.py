@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Renderizado de los gráficos matplotlib del dashboard con cache de imágenes.
+
+@author: elias
+"""
+
+import hashlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+import streamlit as st
+
+from cache_resultados import CacheResultados
+from periodos import TITULOS as TITULOS_PERIODO
+
+# Presupuesto de memoria para las imágenes PNG ya renderizadas (MB)
+PRESUPUESTO_GRAFICOS_MB = float(os.environ.get("BIKESTORE_GRAFICOS_MB", "32"))
+
+# Mismas opciones que usa st.pyplot al rasterizar
+OPCIONES_PNG = {"format": "png", "bbox_inches": "tight", "dpi": 200}
+
+# Series de línea con más puntos que esto se dibujan sin marcadores
+MAX_PUNTOS_MARCADOS = 48
+
+formato_soles = FuncFormatter(lambda x, pos: f"S/ {x:,.0f}")
+
+
+@st.cache_resource
+def obtener_cache_graficos(presupuesto_mb=PRESUPUESTO_GRAFICOS_MB):
+    return CacheResultados(int(presupuesto_mb * 1024 * 1024))
+
+
+def _clave(tipo, serie, estilo):
+    # Hash del contenido de la serie (índice + valores) y del estilo del gráfico
+    h = hashlib.sha1()
+    h.update(f"{tipo}|{sorted(estilo.items())}|{serie.name}|{matplotlib.__version__}".encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(serie, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _rasterizar(dibujar, serie, estilo):
+    # Figure suelta (fuera del registro de pyplot): se libera siempre al terminar
+    fig = Figure(figsize=estilo["figsize"])
+    try:
+        dibujar(fig.subplots(), serie, estilo)
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, **OPCIONES_PNG)
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+def renderizar(tipo, serie, estilo, dibujar):
+    # PNG del gráfico; solo se rasteriza si la serie o el estilo cambiaron
+    return obtener_cache_graficos().obtener(
+        _clave(tipo, serie, estilo),
+        lambda: _rasterizar(dibujar, serie, estilo),
+    )
+
+
+def _rotar_etiquetas_x(ax):
+    plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
+
+
+# ============================================
+# GRÁFICOS DEL DASHBOARD
+# ============================================
+def _dibujar_barras(ax, serie, estilo):
+    colors = plt.get_cmap(estilo["cmap"])(np.linspace(estilo["desde"], 0.9, len(serie)))
+    serie.plot(kind=estilo["kind"], ax=ax, color=colors)
+    ax.set_title(estilo["titulo"], fontsize=14, fontweight="bold")
+    if estilo["kind"] == "barh":
+        ax.set_xlabel("Ventas Totales (S/.)")
+        ax.xaxis.set_major_formatter(formato_soles)
+    else:
+        ax.set_ylabel("Ventas Totales (S/.)")
+        ax.yaxis.set_major_formatter(formato_soles)
+        _rotar_etiquetas_x(ax)
+
+
+def _dibujar_linea(ax, serie, estilo):
+    # Con muchos puntos (días, semanas) sin marcadores y con etiquetas del eje x espaciadas
+    muchos = len(serie) > MAX_PUNTOS_MARCADOS
+    ax.plot(serie.index, serie.values, marker=None if muchos else "o", linewidth=1.5 if muchos else 3, color=estilo["color"])
+    if muchos:
+        ax.xaxis.set_major_locator(MaxNLocator(nbins=MAX_PUNTOS_MARCADOS // 2))
+    ax.set_title(estilo["titulo"], fontsize=14, fontweight="bold")
+    ax.set_ylabel("Ventas Totales (S/.)")
+    ax.yaxis.set_major_formatter(formato_soles)
+    _rotar_etiquetas_x(ax)
+    ax.grid(True, alpha=0.3)
+
+
+def _dibujar_vendedores(ax, serie, estilo):
+    colors = plt.get_cmap(estilo["cmap"])(np.linspace(0.4, 0.9, len(serie)))
+    nombres_vendedores = [str(idx) for idx in serie.index]
+    ax.bar(nombres_vendedores, serie.values, color=colors)
+    ax.set_title(estilo["titulo"], fontsize=14, fontweight="bold")
+    ax.set_ylabel("Ventas Totales (S/.)")
+    ax.yaxis.set_major_formatter(formato_soles)
+    _rotar_etiquetas_x(ax)
+
+
+def grafico_ventas_categoria(serie):
+    estilo = {"figsize": (10, 6), "kind": "bar", "cmap": "Blues", "desde": 0.4, "titulo": "Ventas por Categoría"}
+    return renderizar("ventas_categoria", serie, estilo, _dibujar_barras)
+
+
+def grafico_ventas_periodo(serie, granularidad):
+    estilo = {"figsize": (10, 6), "color": "#2E8B57", "titulo": TITULOS_PERIODO[granularidad]}
+    return renderizar(f"ventas_{granularidad}", serie, estilo, _dibujar_linea)
+
+
+def grafico_ventas_mensuales(serie):
+    return grafico_ventas_periodo(serie, "mes")
+
+
+def grafico_top_productos(serie):
+    estilo = {"figsize": (12, 8), "kind": "barh", "cmap": "Greens", "desde": 0.3, "titulo": "Top Productos Más Vendidos"}
+    return renderizar("top_productos", serie, estilo, _dibujar_barras)
+
+
+def grafico_ventas_segmento(serie):
+    estilo = {"figsize": (10, 6), "kind": "bar", "cmap": "Purples", "desde": 0.4, "titulo": "Ventas por Segmento RFM"}
+    return renderizar("ventas_segmento", serie, estilo, _dibujar_barras)
+
+
+def grafico_top_vendedores(serie):
+    estilo = {"figsize": (10, 6), "cmap": "Oranges", "titulo": "Top Vendedores por Ventas"}
+    return renderizar("top_vendedores", serie, estilo, _dibujar_vendedores)
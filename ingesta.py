@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Almacén de datos del dashboard con ingesta incremental de órdenes nuevas.
+
+@author: elias
+"""
+
+import io
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from datos import (
+    CARPETA_DATOS, ARCHIVOS, RENOMBRES, version_datos, leer_tablas, tipar_tabla, unir_hechos, memoria_mb, congelar,
+)
+from agregados import cubo_desde_hechos, acumulados_desde_cubo, nombres_desde_tablas
+from distintos import indices_desde_hechos
+from cohortes import cohortes_desde_hechos
+
+NOMBRES_TABLAS = ("products", "order_items", "orders", "categories", "staffs")
+
+# Tablas a las que las tiendas solo agregan filas al final durante el día
+TABLAS_INCREMENTALES = ("orders", "order_items")
+
+# Bytes previos a la marca de lectura que se comparan para detectar reescrituras del archivo
+BYTES_FIRMA = 64
+
+
+class AlmacenDatos:
+    # Tablas, hechos y agregados de una carpeta de datos, compartidos por todas las sesiones.
+    # `estado` se reemplaza entero en cada ingesta, nunca se modifica en sitio, y todo lo que
+    # contiene es de solo lectura (ver datos.congelar).
+
+    def __init__(self, carpeta=CARPETA_DATOS):
+        self.carpeta = carpeta
+        self.estado = None
+        self.ultima_ingesta = None
+        self._marcas = {}
+        self._lock = threading.Lock()
+        with self._lock:
+            self._cargar_completo()
+
+    # ----------------------------------------
+    # Marcas de lectura de los CSV incrementales
+    # ----------------------------------------
+    def _ruta(self, nombre):
+        return os.path.join(self.carpeta, ARCHIVOS[nombre])
+
+    def _marcar(self, nombre, posicion):
+        # La marca queda al inicio de la última línea leída si no terminaba en salto de
+        # línea (`cola`, ya incorporada); la firma son los bytes inmediatamente anteriores
+        with open(self._ruta(nombre), "rb") as archivo:
+            encabezado = archivo.readline()
+            inicio = posicion
+            while inicio > len(encabezado):
+                tramo = max(len(encabezado), inicio - BYTES_FIRMA)
+                archivo.seek(tramo)
+                salto = archivo.read(inicio - tramo).rfind(b"\n")
+                if salto >= 0:
+                    inicio = tramo + salto + 1
+                    break
+                inicio = tramo
+            archivo.seek(inicio)
+            cola = archivo.read(posicion - inicio)
+            archivo.seek(max(0, inicio - BYTES_FIRMA))
+            firma = archivo.read(min(inicio, BYTES_FIRMA))
+        self._marcas[nombre] = {
+            "posicion": inicio,
+            "cola": cola,
+            "firma": firma,
+            "columnas": encabezado.decode("utf-8-sig").strip().split(","),
+        }
+
+    def _solo_agregado(self, nombre):
+        # True si el archivo creció sin tocar lo ya leído; la cola solo puede seguir con un
+        # salto de línea (si siguiera con más texto, la fila ya incorporada habría cambiado)
+        marca = self._marcas[nombre]
+        if os.path.getsize(self._ruta(nombre)) < marca["posicion"] + len(marca["cola"]):
+            return False
+        with open(self._ruta(nombre), "rb") as archivo:
+            archivo.seek(marca["posicion"] - len(marca["firma"]))
+            if archivo.read(len(marca["firma"])) != marca["firma"]:
+                return False
+            if not marca["cola"]:
+                return True
+            siguiente = archivo.read(len(marca["cola"]) + 1)
+        return siguiente[:-1] == marca["cola"] and siguiente[-1:] in (b"\r", b"\n") or siguiente == marca["cola"]
+
+    def _leer_agregado(self, nombre):
+        # Las filas escritas después de la marca, incluida la última aunque no termine en
+        # salto de línea (igual que una lectura completa); la cola ya incorporada se descarta
+        marca = self._marcas[nombre]
+        with open(self._ruta(nombre), "rb") as archivo:
+            archivo.seek(marca["posicion"])
+            bloque = archivo.read()
+        self._marcar(nombre, marca["posicion"] + len(bloque))
+        if marca["cola"].strip():
+            bloque = bloque[len(marca["cola"]):]
+        if not bloque.strip():
+            return None
+        nuevas = pd.read_csv(io.BytesIO(bloque), header=None, names=marca["columnas"])
+        return tipar_tabla(nuevas).rename(columns=RENOMBRES.get(nombre, {}))
+
+    # ----------------------------------------
+    # Carga completa e ingesta incremental
+    # ----------------------------------------
+    def _cargar_completo(self):
+        version = version_datos(self.carpeta)
+        tamanos = {nombre: os.path.getsize(self._ruta(nombre)) for nombre in TABLAS_INCREMENTALES}
+        tablas = congelar(dict(zip(NOMBRES_TABLAS, leer_tablas(self.carpeta))))
+        for nombre in TABLAS_INCREMENTALES:
+            self._marcar(nombre, tamanos[nombre])
+
+        hechos = congelar(unir_hechos(*(tablas[nombre] for nombre in NOMBRES_TABLAS)))
+        cubo = congelar(cubo_desde_hechos(hechos))
+        self.estado = {
+            "version": version,
+            "tablas": tablas,
+            "hechos": hechos,
+            "memoria_hechos_mb": memoria_mb(hechos),
+            "cubo": cubo,
+            "acumulados": congelar(acumulados_desde_cubo(cubo)),
+            "indices_distintos": congelar(indices_desde_hechos(hechos)),
+            "cohortes": congelar(cohortes_desde_hechos(hechos)),
+            "nombres": nombres_desde_tablas(tablas["products"], tablas["categories"], tablas["staffs"]),
+            "pendientes": tablas["order_items"].iloc[:0],
+        }
+        self.ultima_ingesta = {"modo": "completa", "filas": len(hechos), "momento": datetime.now()}
+
+    def _ingerir(self, version):
+        estado = self.estado
+        tablas = dict(estado["tablas"])
+
+        orders_nuevas = self._leer_agregado("orders")
+        items_nuevos = self._leer_agregado("order_items")
+        if orders_nuevas is not None:
+            tablas["orders"] = congelar(pd.concat([tablas["orders"], orders_nuevas], ignore_index=True))
+        if items_nuevos is not None:
+            tablas["order_items"] = congelar(pd.concat([tablas["order_items"], items_nuevos], ignore_index=True))
+
+        # Líneas nuevas + las que esperaban a que llegara su orden
+        items = pd.concat([estado["pendientes"], items_nuevos], ignore_index=True)
+        orders = tablas["orders"]
+        orders = orders[orders["order_id"].isin(items["order_id"].unique())]
+        pendientes = items[~items["order_id"].isin(orders["order_id"])]
+
+        nuevo = dict(estado, version=version, tablas=tablas, pendientes=pendientes)
+
+        # Join solo de las líneas nuevas contra las dimensiones ya cargadas
+        hechos_nuevos = unir_hechos(
+            tablas["products"], items, orders, tablas["categories"], tablas["staffs"]
+        )
+        if len(hechos_nuevos):
+            desde = hechos_nuevos["order_date"].min()
+            hechos = pd.concat([estado["hechos"], hechos_nuevos], ignore_index=True)
+            if desde < estado["hechos"]["order_date"].max():
+                hechos = hechos.sort_values("order_date", kind="stable", ignore_index=True)
+
+            # Los agregados solo se recalculan desde el primer día con ventas nuevas
+            cubo = estado["cubo"]
+            cubo = pd.concat(
+                [
+                    cubo.iloc[:cubo["order_date"].searchsorted(desde)],
+                    cubo_desde_hechos(hechos.iloc[hechos["order_date"].searchsorted(desde):]),
+                ],
+                ignore_index=True,
+            )
+            nuevo.update(congelar({
+                "hechos": hechos,
+                "memoria_hechos_mb": memoria_mb(hechos),
+                "cubo": cubo,
+                "acumulados": acumulados_desde_cubo(cubo, estado["acumulados"], desde),
+                "indices_distintos": indices_desde_hechos(hechos, estado["indices_distintos"], desde),
+                "cohortes": cohortes_desde_hechos(hechos, estado["cohortes"], desde),
+            }))
+
+        self.estado = nuevo
+        self.ultima_ingesta = {"modo": "incremental", "filas": len(hechos_nuevos), "momento": datetime.now()}
+
+    def actualizar(self):
+        # Incorpora los cambios de los CSV y devuelve el estado vigente
+        version = version_datos(self.carpeta)
+        if version == self.estado["version"]:
+            return self.estado
+        with self._lock:
+            if version != self.estado["version"]:
+                cambiadas = {nueva[0] for nueva, previa in zip(version, self.estado["version"]) if nueva != previa}
+                if cambiadas <= set(TABLAS_INCREMENTALES) and all(
+                    self._solo_agregado(nombre) for nombre in TABLAS_INCREMENTALES
+                ):
+                    self._ingerir(version)
+                else:
+                    self._cargar_completo()
+            return self.estado
+
+
+@st.cache_resource
+def obtener_almacen(carpeta=CARPETA_DATOS):
+    # Un almacén por proceso y carpeta de datos
+    return AlmacenDatos(carpeta)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Cobertura de inventario por tienda y producto: stock actual (stocks.csv) contra la
+velocidad de venta reciente.
+
+Stock y ventas se llevan como matrices densas tienda x producto; días de cobertura,
+riesgo de quiebre y sobrestock salen de operaciones sobre la matriz completa.
+
+@author: elias
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from datos import CARPETA_DATOS, ARCHIVOS_INVENTARIO, VERSIONES_EN_MEMORIA, version_datos, leer_tabla, congelar
+
+# Días de ventas (hasta la fecha fin del filtro) con que se estima la venta diaria
+VENTANA_DIAS = int(os.environ.get("BIKESTORE_VENTANA_INVENTARIO", "90"))
+
+# Cobertura en días por debajo de la cual hay riesgo de quiebre / por encima de la cual sobra stock
+DIAS_RIESGO = int(os.environ.get("BIKESTORE_DIAS_RIESGO", "14"))
+DIAS_SOBRESTOCK = int(os.environ.get("BIKESTORE_DIAS_SOBRESTOCK", "180"))
+
+# Filas de las tablas de riesgo y sobrestock
+FILAS_DETALLE = 15
+
+
+def version_inventario(carpeta=CARPETA_DATOS):
+    return version_datos(carpeta, ARCHIVOS_INVENTARIO)
+
+
+def _posiciones(ids, valores):
+    # Posición de cada valor en `ids` (ordenado) y máscara de los que existen
+    valores = np.asarray(valores)
+    posiciones = np.minimum(np.searchsorted(ids, valores), max(len(ids) - 1, 0))
+    return posiciones, ids[posiciones] == valores
+
+
+def matriz_tienda_producto(inventario, store_ids, product_ids, valores):
+    # Suma de `valores` por (tienda, producto) en una matriz densa; ignora ids desconocidos
+    fila, en_tiendas = _posiciones(inventario["tienda_ids"], store_ids)
+    columna, en_productos = _posiciones(inventario["producto_ids"], product_ids)
+    validas = en_tiendas & en_productos
+    num_tiendas, num_productos = len(inventario["tienda_ids"]), len(inventario["producto_ids"])
+    plana = np.bincount(
+        fila[validas] * num_productos + columna[validas],
+        weights=np.asarray(valores, dtype=np.float64)[validas],
+        minlength=num_tiendas * num_productos,
+    )
+    return plana.reshape(num_tiendas, num_productos)
+
+
+# ============================================
+# MATRIZ DE STOCK (TIENDA x PRODUCTO)
+# ============================================
+def inventario_desde_tablas(stocks, stores, products):
+    tiendas = stores.sort_values("store_id")
+    productos = products.sort_values("product_id")
+    inventario = {
+        "tienda_ids": tiendas["store_id"].to_numpy(),
+        "producto_ids": productos["product_id"].to_numpy(),
+        "tiendas": tiendas["store_name"].astype(str).to_numpy(),
+        "productos": productos["product_name"].astype(str).to_numpy(),
+        "categorias_producto": productos["category_id"].to_numpy(),
+    }
+    inventario["stock"] = matriz_tienda_producto(
+        inventario, stocks["store_id"], stocks["product_id"], stocks["quantity"]
+    ).astype(np.int64)
+    return inventario
+
+
+@st.cache_resource(max_entries=VERSIONES_EN_MEMORIA)
+def construir_inventario(carpeta=CARPETA_DATOS, version=None):
+    # `version` (CSV de ventas + inventario) solo participa en la clave del cache
+    tablas = [leer_tabla(nombre, carpeta) for nombre in ("stocks", "stores", "products")]
+    return congelar(inventario_desde_tablas(*tablas))
+
+
+# ============================================
+# VELOCIDAD DE VENTA
+# ============================================
+def ventana_ventas(fecha_fin, dias, fecha_min):
+    # Rango [inicio, fin] de los últimos `dias` días (recortado al primer día con datos) y su largo
+    fin = pd.Timestamp(fecha_fin)
+    inicio = max(fin - pd.Timedelta(days=dias - 1), pd.Timestamp(fecha_min).normalize())
+    return inicio.date(), fin.date(), max((fin - inicio).days + 1, 1)
+
+
+def ventas_desde_hechos(hechos, fecha_ini, fecha_fin):
+    # Líneas vendidas en el rango: la tabla viene ordenada por fecha (slice sin copia)
+    ini = hechos["order_date"].searchsorted(pd.Timestamp(fecha_ini), side="left")
+    fin = hechos["order_date"].searchsorted(pd.Timestamp(fecha_fin), side="right")
+    return hechos.iloc[ini:fin][["store_id", "product_id", "quantity"]]
+
+
+# ============================================
+# COBERTURA, QUIEBRES Y SOBRESTOCK
+# ============================================
+def _detalle(inventario, productos, stock, velocidad, cobertura, mascara, orden, n=FILAS_DETALLE):
+    # Las `n` celdas marcadas con menor `orden`, sin ordenar la matriz completa
+    plano = np.where(mascara, orden, np.inf).ravel()
+    k = min(n, int(mascara.sum()))
+    elegidas = np.argpartition(plano, k - 1)[:k] if k else np.array([], dtype=np.intp)
+    elegidas = elegidas[np.argsort(plano[elegidas], kind="stable")]
+    fila, columna = np.unravel_index(elegidas, mascara.shape)
+    return pd.DataFrame({
+        "Tienda": inventario["tiendas"][fila],
+        "Producto": productos[columna],
+        "Stock": stock[fila, columna],
+        "Venta diaria": velocidad[fila, columna],
+        "Días de cobertura": cobertura[fila, columna],
+    })
+
+
+def evaluar_inventario(inventario, ventas, dias_ventana, categoria_ids,
+                       dias_riesgo=DIAS_RIESGO, dias_sobrestock=DIAS_SOBRESTOCK):
+    # `ventas`: líneas (store_id, product_id, quantity) de la ventana de `dias_ventana` días
+    columnas = np.isin(inventario["categorias_producto"], np.asarray(categoria_ids))
+    productos = inventario["productos"][columnas]
+    stock = inventario["stock"][:, columnas]
+    vendidas = matriz_tienda_producto(inventario, ventas["store_id"], ventas["product_id"], ventas["quantity"])
+    velocidad = vendidas[:, columnas] / dias_ventana
+
+    # Días que dura el stock al ritmo actual (infinito si el producto no se vende en la tienda)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cobertura = np.where(velocidad > 0, stock / velocidad, np.inf)
+    riesgo = (velocidad > 0) & (cobertura < dias_riesgo)
+    sobrestock = (stock > 0) & (cobertura > dias_sobrestock)
+    exceso = np.where(sobrestock, stock - velocidad * dias_sobrestock, 0.0)
+
+    stock_tienda = stock.sum(axis=1)
+    velocidad_tienda = velocidad.sum(axis=1)
+    resumen = pd.DataFrame(
+        {
+            "Unidades en stock": stock_tienda,
+            "Venta diaria": velocidad_tienda,
+            "Días de cobertura": np.divide(
+                stock_tienda, velocidad_tienda, out=np.full(len(stock_tienda), np.inf), where=velocidad_tienda > 0
+            ),
+            "En riesgo": riesgo.sum(axis=1),
+            "Sobrestock": sobrestock.sum(axis=1),
+            "Unidades de exceso": exceso.sum(axis=1),
+        },
+        index=pd.Index(inventario["tiendas"], name="Tienda"),
+    )
+    return {
+        "unidades": int(stock.sum()),
+        "en_riesgo": int(riesgo.sum()),
+        "agotados": int((riesgo & (stock == 0)).sum()),
+        "sobrestock": int(sobrestock.sum()),
+        "unidades_exceso": float(exceso.sum()),
+        "resumen_tiendas": resumen,
+        # Más urgentes primero / mayor exceso primero
+        "riesgo": _detalle(inventario, productos, stock, velocidad, cobertura, riesgo, cobertura),
+        "exceso": _detalle(inventario, productos, stock, velocidad, cobertura, sobrestock, -exceso),
+    }
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Motor SQL embebido (SQLite o DuckDB) como alternativa a pandas para filtros y agregaciones.
+
+Los CSV se cargan por bloques en una base en memoria y cada filtro del dashboard se
+resuelve con consultas que devuelven solo las series ya agregadas.
+Se elige con BIKESTORE_MOTOR=sqlite|duckdb (por defecto pandas).
+
+@author: elias
+"""
+
+import importlib.util
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+import streamlit as st
+
+from datos import CARPETA_DATOS, ARCHIVOS, RENOMBRES, COLUMNAS_JOIN, version_datos, congelar
+from cohortes import cohortes_desde_hechos
+from periodos import dias_desde_fechas, ventas_por_periodo
+from ranking import TOP_VENDEDORES, codigos_nombres, sumar_por_nombre, top_k
+
+# DuckDB es opcional (agregaciones en varios núcleos); SQLite viene con Python
+DUCKDB_DISPONIBLE = importlib.util.find_spec("duckdb") is not None
+
+MOTORES = ["pandas", "sqlite"] + (["duckdb"] if DUCKDB_DISPONIBLE else [])
+
+MOTOR_DATOS = os.environ.get("BIKESTORE_MOTOR", "pandas").lower()
+if MOTOR_DATOS not in MOTORES:
+    raise ValueError(f"BIKESTORE_MOTOR={MOTOR_DATOS} no disponible; opciones: {', '.join(MOTORES)}")
+
+# Filas por bloque al cargar los CSV (la carga no arma la tabla completa en pandas)
+FILAS_POR_BLOQUE = 100_000
+
+# Tablas grandes: solo se cargan las columnas que usa la tabla de hechos
+TABLAS_HECHOS = ("order_items", "orders")
+
+SQL_HECHOS = """
+CREATE TABLE hechos AS
+SELECT
+    oi.order_id, oi.product_id, p.category_id, o.customer_id, o.staff_id, o.store_id, o.order_date,
+    CAST(substr(o.order_date, 1, 4) || substr(o.order_date, 6, 2) AS INTEGER) AS mes,
+    oi.quantity,
+    oi.quantity * oi.list_price_order * (1 - oi.discount) AS total
+FROM order_items oi
+JOIN products p ON p.product_id = oi.product_id
+JOIN categories c ON c.category_id = p.category_id
+JOIN orders o ON o.order_id = oi.order_id
+JOIN staffs s ON s.staff_id = o.staff_id
+ORDER BY o.order_date
+"""
+
+
+class MotorSQL:
+    # Base en memoria con la tabla de hechos y las dimensiones, recargada al cambiar los CSV
+
+    def __init__(self, motor="sqlite", carpeta=CARPETA_DATOS):
+        if motor not in ("sqlite", "duckdb"):
+            raise ValueError(f"Motor SQL no soportado: {motor}")
+        if motor == "duckdb" and not DUCKDB_DISPONIBLE:
+            raise ValueError("El motor duckdb requiere el paquete duckdb instalado")
+        self.motor = motor
+        self.carpeta = carpeta
+        self.estado = None
+        self._conexion = None
+        self._lock = threading.Lock()
+        self._lock_carga = threading.Lock()
+        # Consultas DuckDB en curso por conexión (corren fuera del lock)
+        self._en_curso = {}
+
+    # ----------------------------------------
+    # Carga
+    # ----------------------------------------
+    def _conectar(self):
+        if self.motor == "duckdb":
+            import duckdb
+            return duckdb.connect(":memory:")
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    def _insertar(self, conexion, tabla, bloque, primero):
+        if self.motor == "duckdb":
+            conexion.register("_bloque", bloque)
+            if primero:
+                conexion.execute(f"CREATE TABLE {tabla} AS SELECT * FROM _bloque")
+            else:
+                conexion.execute(f"INSERT INTO {tabla} SELECT * FROM _bloque")
+            conexion.unregister("_bloque")
+        else:
+            bloque.to_sql(tabla, conexion, if_exists="replace" if primero else "append", index=False)
+
+    def _cargar_tabla(self, conexion, nombre):
+        renombres = RENOMBRES.get(nombre, {})
+        columnas = COLUMNAS_JOIN[nombre] if nombre in TABLAS_HECHOS else None
+        bloques = pd.read_csv(
+            os.path.join(self.carpeta, ARCHIVOS[nombre]),
+            usecols=(lambda col: renombres.get(col, col) in columnas) if columnas else None,
+            chunksize=FILAS_POR_BLOQUE,
+        )
+        for i, bloque in enumerate(bloques):
+            self._insertar(conexion, nombre, bloque.rename(columns=renombres), i == 0)
+
+    def _cargar(self, version):
+        conexion = self._conectar()
+        for nombre in ARCHIVOS:
+            self._cargar_tabla(conexion, nombre)
+        conexion.execute(SQL_HECHOS)
+        for nombre in TABLAS_HECHOS:
+            conexion.execute(f"DROP TABLE {nombre}")
+        if self.motor == "sqlite":
+            conexion.execute("CREATE INDEX idx_hechos_fecha ON hechos (order_date, category_id)")
+        conexion.commit()
+
+        # La base anterior se cierra para liberar su memoria; si aún tiene consultas DuckDB
+        # en curso, la cierra la última que termine
+        with self._lock:
+            anterior, self._conexion = self._conexion, conexion
+            if anterior is not None and not self._en_curso.get(id(anterior)):
+                anterior.close()
+        resumen = self.consultar(
+            "SELECT MIN(order_date) AS fecha_min, MAX(order_date) AS fecha_max, "
+            "MAX(total) AS max_total, COUNT(*) AS filas FROM hechos"
+        ).iloc[0]
+        categorias = self.consultar(
+            "SELECT category_id, category_name FROM categories "
+            "WHERE category_id IN (SELECT DISTINCT category_id FROM hechos) ORDER BY category_id"
+        )
+        self.estado = {
+            "version": version,
+            "fecha_min": pd.Timestamp(resumen["fecha_min"]),
+            "fecha_max": pd.Timestamp(resumen["fecha_max"]),
+            "max_total": float(resumen["max_total"]),
+            "filas": int(resumen["filas"]),
+            "categorias": pd.Series(
+                categorias["category_name"].to_numpy(), index=categorias["category_id"], name="category_name"
+            ),
+            "columnas_staffs": list(self.consultar("SELECT * FROM staffs LIMIT 0").columns),
+            # Códigos de nombre de productos y vendedores para los rankings
+            "codigos": self._codigos_nombres(),
+            # Cohortes desde las ventas por cliente y mes (ya agregadas en la base)
+            "cohortes": congelar(cohortes_desde_hechos(self.consultar(
+                "SELECT customer_id, mes, SUM(total) AS total FROM hechos GROUP BY mes, customer_id ORDER BY mes"
+            ))),
+        }
+
+    def _codigos_nombres(self):
+        productos = self.consultar("SELECT product_id, product_name FROM products")
+        vendedores = self.consultar("SELECT staff_id, first_name || ' ' || last_name AS staff_name FROM staffs")
+        return congelar({
+            "productos": codigos_nombres(pd.Series(
+                productos["product_name"].to_numpy(), index=productos["product_id"].to_numpy(), name="product_name"
+            )),
+            "vendedores": codigos_nombres(pd.Series(
+                vendedores["staff_name"].to_numpy(), index=vendedores["staff_id"].to_numpy(), name="staff_name"
+            )),
+        })
+
+    def actualizar(self):
+        # Recarga la base si cambió algún CSV y devuelve el estado vigente
+        version = version_datos(self.carpeta)
+        if self.estado is not None and version == self.estado["version"]:
+            return self.estado
+        with self._lock_carga:
+            if self.estado is None or version != self.estado["version"]:
+                self._cargar(version)
+            return self.estado
+
+    # ----------------------------------------
+    # Consultas
+    # ----------------------------------------
+    def consultar(self, sql, parametros=()):
+        if self.motor == "duckdb":
+            # Cada cursor de DuckDB es seguro entre hilos y paraleliza la consulta
+            with self._lock:
+                conexion = self._conexion
+                self._en_curso[id(conexion)] = self._en_curso.get(id(conexion), 0) + 1
+            try:
+                with conexion.cursor() as cursor:
+                    return cursor.execute(sql, list(parametros)).df()
+            finally:
+                with self._lock:
+                    self._en_curso[id(conexion)] -= 1
+                    if not self._en_curso[id(conexion)]:
+                        del self._en_curso[id(conexion)]
+                        if conexion is not self._conexion:
+                            conexion.close()
+        with self._lock:
+            return pd.read_sql_query(sql, self._conexion, params=list(parametros))
+
+    @staticmethod
+    def _filtro(categoria_ids, fecha_ini, fecha_fin):
+        # Condición WHERE sobre `hechos h` y sus parámetros
+        ids = [int(i) for i in categoria_ids]
+        categorias = f"h.category_id IN ({', '.join('?' * len(ids))})" if ids else "1 = 0"
+        return f"h.order_date BETWEEN ? AND ? AND {categorias}", [str(fecha_ini), str(fecha_fin), *ids]
+
+    def _serie(self, sql, parametros, indice, nombre_indice):
+        tabla = self.consultar(sql, parametros)
+        return pd.Series(
+            tabla["total"].to_numpy(dtype=float), index=pd.Index(tabla[indice].to_numpy(), name=nombre_indice), name="total"
+        )
+
+    def resultados(self, categoria_ids, fecha_ini, fecha_fin):
+        # Mismo diccionario que agregados.calcular_resultados
+        where, parametros = self._filtro(categoria_ids, fecha_ini, fecha_fin)
+        ventas_categoria = self._serie(
+            "SELECT c.category_name, SUM(h.total) AS total FROM hechos h "
+            f"JOIN categories c ON c.category_id = h.category_id WHERE {where} "
+            "GROUP BY c.category_name ORDER BY total DESC",
+            parametros, "category_name", "category_name",
+        )
+        # Serie diaria: las demás granularidades se agregan desde ella, fuera de la base
+        ventas_diarias = self._serie(
+            "SELECT substr(h.order_date, 1, 10) AS dia, SUM(h.total) AS total FROM hechos h "
+            f"WHERE {where} GROUP BY dia ORDER BY dia",
+            parametros, "dia", "dia",
+        )
+        ventas_diarias.index = pd.Index(dias_desde_fechas(pd.to_datetime(ventas_diarias.index)), name="dia")
+        # Sumas por id (sin ordenar ni unir nombres en la base); el ranking se arma con
+        # los códigos de nombre del estado y los nombres solo se leen para el top K
+        ventas_productos = self._serie(
+            f"SELECT h.product_id, SUM(h.total) AS total FROM hechos h WHERE {where} GROUP BY h.product_id",
+            parametros, "product_id", "product_id",
+        )
+        ventas_vendedores = self._serie(
+            f"SELECT h.staff_id, SUM(h.total) AS total FROM hechos h WHERE {where} GROUP BY h.staff_id",
+            parametros, "staff_id", "staff_id",
+        )
+        codigos = self.estado["codigos"]
+        return {
+            "ventas_totales": float(ventas_categoria.sum()),
+            "ventas_categoria": ventas_categoria,
+            "ventas_diarias": ventas_diarias,
+            "ventas_mensuales": ventas_por_periodo(ventas_diarias, "mes"),
+            "ventas_productos": sumar_por_nombre(codigos["productos"], ventas_productos.index, ventas_productos),
+            "ventas_vendedores": top_k(
+                sumar_por_nombre(codigos["vendedores"], ventas_vendedores.index, ventas_vendedores), TOP_VENDEDORES
+            ),
+        }
+
+    def conteos(self, categoria_ids, fecha_ini, fecha_fin, aproximado=False):
+        # Mismo diccionario que distintos.calcular_conteos (aproximado solo en DuckDB)
+        where, parametros = self._filtro(categoria_ids, fecha_ini, fecha_fin)
+        contar = "approx_count_distinct({})" if aproximado and self.motor == "duckdb" else "COUNT(DISTINCT {})"
+        fila = self.consultar(
+            f"SELECT {contar.format('h.order_id')} AS num_ordenes, {contar.format('h.product_id')} AS num_productos, "
+            f"{contar.format('h.customer_id')} AS num_clientes FROM hechos h WHERE {where}",
+            parametros,
+        ).iloc[0]
+        return {clave: int(valor) for clave, valor in fila.items()}
+
+    def detalle(self, categoria_ids, fecha_ini, fecha_fin):
+        # Filas del reporte descargable (solo se consulta al descargar)
+        where, parametros = self._filtro(categoria_ids, fecha_ini, fecha_fin)
+        tabla = self.consultar(
+            "SELECT p.product_name, c.category_name, h.quantity, h.total, h.order_date FROM hechos h "
+            "JOIN products p ON p.product_id = h.product_id "
+            f"JOIN categories c ON c.category_id = h.category_id WHERE {where} ORDER BY h.order_date",
+            parametros,
+        )
+        tabla["order_date"] = pd.to_datetime(tabla["order_date"])
+        return tabla
+
+    def pedidos_clientes(self):
+        # Una fila por pedido y categoría, en el orden de clientes.pedidos_desde_hechos
+        return self.consultar(
+            "SELECT order_date, order_id, category_id, customer_id, SUM(total) AS total FROM hechos "
+            "GROUP BY order_date, order_id, category_id, customer_id ORDER BY order_date, order_id, category_id"
+        )
+
+    def ventas_tienda_producto(self, fecha_ini, fecha_fin):
+        # Unidades vendidas por tienda y producto en el rango (para la velocidad de venta del inventario)
+        return self.consultar(
+            "SELECT h.store_id, h.product_id, SUM(h.quantity) AS quantity FROM hechos h "
+            "WHERE h.order_date BETWEEN ? AND ? GROUP BY h.store_id, h.product_id",
+            [str(fecha_ini), str(fecha_fin)],
+        )
+
+
+@st.cache_resource
+def obtener_motor_sql(motor, carpeta=CARPETA_DATOS):
+    # Una base por proceso, motor y carpeta de datos
+    return MotorSQL(motor, carpeta)
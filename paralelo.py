@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Agregación particionada en un pool de procesos para históricos grandes.
+
+La tabla (ordenada por order_date) se corta en tramos contiguos alineados a inicio
+de mes; cada proceso calcula un agregado parcial y el llamador combina los parciales.
+
+@author: elias
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Procesos del pool (por defecto, uno por núcleo)
+PROCESOS = int(os.environ.get("BIKESTORE_PROCESOS", "0")) or os.cpu_count() or 1
+
+# Por debajo de este tamaño copiar los tramos a otros procesos cuesta más de lo que ahorra
+FILAS_MIN_PARALELO = int(os.environ.get("BIKESTORE_FILAS_PARALELO", "2000000"))
+
+
+@st.cache_resource
+def obtener_pool(procesos=PROCESOS):
+    # "spawn": igual en Windows y Linux, y no hereda los hilos del servidor de Streamlit
+    return ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"))
+
+
+def usar_paralelo(df):
+    return PROCESOS > 1 and len(df) >= FILAS_MIN_PARALELO
+
+
+def particiones_por_mes(df, num_particiones):
+    # Tramos [inicio, fin) de filas con cortes solo en el primer día de un mes,
+    # de tamaño lo más parecido posible
+    fechas = df["order_date"]
+    inicios_mes = pd.date_range(fechas.iloc[0].to_period("M").to_timestamp(), fechas.iloc[-1], freq="MS")[1:]
+    cortes = fechas.searchsorted(inicios_mes)
+    if len(cortes) == 0:
+        return [(0, len(df))]
+    objetivos = np.linspace(0, len(df), num_particiones + 1)[1:-1]
+    elegidos = cortes[np.clip(np.searchsorted(cortes, objetivos), 0, len(cortes) - 1)]
+    limites = np.unique(np.concatenate([[0], elegidos, [len(df)]]))
+    return list(zip(limites[:-1], limites[1:]))
+
+
+def mapear_particiones(funcion, df, *args):
+    # Lista de `funcion(tramo, *args)` por tramo mensual; un solo tramo si la tabla es chica.
+    # `funcion` debe estar definida a nivel de módulo (se envía a los procesos por nombre).
+    if not usar_paralelo(df):
+        return [funcion(df, *args)]
+    tramos = [df.iloc[inicio:fin] for inicio, fin in particiones_por_mes(df, PROCESOS)]
+    try:
+        return list(obtener_pool().map(funcion, tramos, *([arg] * len(tramos) for arg in args)))
+    except BrokenProcessPool:
+        # Un proceso murió (p. ej. por memoria): se descarta el pool y se calcula aquí
+        obtener_pool.clear()
+        return [funcion(tramo, *args) for tramo in tramos]
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Perfilador opcional de reruns: tiempos por etapa del dashboard, panel de depuración
+en la barra lateral y registro JSONL para análisis posterior.
+
+Se activa con BIKESTORE_PERFILAR=1 o agregando ?perfilar=1 a la URL.
+
+@author: elias
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+PERFILAR = os.environ.get("BIKESTORE_PERFILAR", "0") == "1"
+RUTA_LOG = os.environ.get("BIKESTORE_PERFIL_LOG", "perfil_reruns.jsonl")
+
+# Reruns recientes que se muestran en el panel (por sesión)
+HISTORIAL_MAX = 20
+
+CLAVE_PERFIL = "_perfil_rerun"
+CLAVE_HISTORIAL = "_perfil_historial"
+
+_lock_log = threading.Lock()
+
+
+def activo():
+    return PERFILAR or st.query_params.get("perfilar") == "1"
+
+
+def _id_sesion():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+class Perfil:
+    # Tiempos de las etapas de una ejecución (script completo, fragmento o descarga)
+
+    def __init__(self, tipo, nombre):
+        self.tipo = tipo
+        self.nombre = nombre
+        self.sesion = _id_sesion()
+        self.momento = datetime.now()
+        self.etapas = []
+        self.pila = []
+        self.total_ms = None
+        self._inicio = time.perf_counter()
+
+    @property
+    def terminado(self):
+        return self.total_ms is not None
+
+    def terminar(self):
+        self.total_ms = (time.perf_counter() - self._inicio) * 1000
+        return {
+            "momento": self.momento.isoformat(timespec="milliseconds"),
+            "sesion": self.sesion,
+            "tipo": self.tipo,
+            "nombre": self.nombre,
+            "total_ms": round(self.total_ms, 3),
+            "etapas": self.etapas,
+        }
+
+
+class _Etapa:
+    # Se entrega dentro del `with etapa(...)`: permite anotar si hubo acierto de cache
+
+    def __init__(self, registro):
+        self.registro = registro
+
+    def envolver(self, calcular):
+        # El cache solo invoca `calcular` en un fallo; si no se llama, fue un acierto
+        self.registro["cache"] = "acierto"
+
+        def calcular_y_marcar():
+            self.registro["cache"] = "fallo"
+            return calcular()
+        return calcular_y_marcar
+
+    def anotar(self, **detalle):
+        self.registro.update(detalle)
+
+
+class _EtapaInactiva:
+    # Perfilador apagado: mismas operaciones, sin costo
+
+    def envolver(self, calcular):
+        return calcular
+
+    def anotar(self, **detalle):
+        pass
+
+
+_INACTIVA = _EtapaInactiva()
+
+
+def _escribir_log(registro):
+    linea = json.dumps(registro, ensure_ascii=False, default=str)
+    with _lock_log:
+        try:
+            with open(RUTA_LOG, "a", encoding="utf-8") as archivo:
+                archivo.write(linea + "\n")
+        except OSError:
+            # Sin permisos de escritura: el panel sigue funcionando
+            pass
+
+
+def _cerrar(perfil):
+    registro = perfil.terminar()
+    _escribir_log(registro)
+    st.session_state.setdefault(CLAVE_HISTORIAL, deque(maxlen=HISTORIAL_MAX)).append(registro)
+
+
+# ============================================
+# API PARA EL SCRIPT
+# ============================================
+def iniciar(nombre="app"):
+    # Al comienzo de cada rerun completo
+    if activo():
+        st.session_state[CLAVE_PERFIL] = Perfil("script", nombre)
+    else:
+        st.session_state.pop(CLAVE_PERFIL, None)
+
+
+def _perfil_en_curso():
+    perfil = st.session_state.get(CLAVE_PERFIL)
+    return perfil if perfil is not None and not perfil.terminado else None
+
+
+@contextmanager
+def etapa(nombre):
+    # Mide el bloque; las etapas anidadas se registran como "padre/hija"
+    perfil = _perfil_en_curso()
+    if perfil is None:
+        yield _INACTIVA
+        return
+    registro = {"etapa": "/".join(perfil.pila + [nombre]), "ms": None, "cache": None}
+    perfil.etapas.append(registro)
+    perfil.pila.append(nombre)
+    inicio = time.perf_counter()
+    try:
+        yield _Etapa(registro)
+    finally:
+        registro["ms"] = round((time.perf_counter() - inicio) * 1000, 3)
+        perfil.pila.pop()
+
+
+def seccion(nombre):
+    # Decorador para los fragmentos: dentro del rerun completo es una etapa más;
+    # cuando el fragmento se re-ejecuta solo, abre y cierra su propio perfil
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if _perfil_en_curso() is not None:
+                with etapa(nombre):
+                    return funcion(*args, **kwargs)
+            if not activo():
+                return funcion(*args, **kwargs)
+            perfil = Perfil("fragmento", nombre)
+            st.session_state[CLAVE_PERFIL] = perfil
+            try:
+                with etapa(nombre):
+                    return funcion(*args, **kwargs)
+            finally:
+                _cerrar(perfil)
+        return envoltura
+    return decorador
+
+
+def descarga(nombre, generar):
+    # Las descargas se generan fuera del rerun: solo se registran en el log
+    if not activo():
+        return generar
+    sesion = _id_sesion()
+
+    def generar_y_medir():
+        perfil = Perfil("descarga", nombre)
+        perfil.sesion = sesion
+        inicio = time.perf_counter()
+        datos = generar()
+        perfil.etapas.append({"etapa": nombre, "ms": round((time.perf_counter() - inicio) * 1000, 3), "bytes": len(datos)})
+        _escribir_log(perfil.terminar())
+        return datos
+    return generar_y_medir
+
+
+def finalizar(estadisticas_cache=None):
+    # Al final del script: cierra el perfil y dibuja el panel en la barra lateral
+    perfil = _perfil_en_curso()
+    if perfil is None:
+        return
+    _cerrar(perfil)
+
+    with st.sidebar.expander("🩺 Perfil del rerun", expanded=False):
+        st.caption(f"Total: {perfil.total_ms:,.1f} ms · log: {RUTA_LOG}")
+        tabla = pd.DataFrame(perfil.etapas, columns=["etapa", "ms", "cache"])
+        st.dataframe(tabla, hide_index=True, width="stretch")
+        for nombre, stats in (estadisticas_cache or {}).items():
+            st.caption(
+                f"{nombre}: {stats['aciertos']} aciertos / {stats['fallos']} fallos · "
+                f"{stats['entradas']} entradas · {stats['uso_mb']:.1f} MB"
+            )
+        anteriores = [
+            {"momento": r["momento"][11:], "tipo": r["tipo"], "nombre": r["nombre"], "ms": r["total_ms"]}
+            for r in reversed(st.session_state[CLAVE_HISTORIAL])
+        ]
+        st.markdown("**Ejecuciones recientes**")
+        st.dataframe(pd.DataFrame(anteriores), hide_index=True, width="stretch")
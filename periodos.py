@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Agrupación de ventas por período (día, semana, mes, trimestre o año).
+
+Las fechas se convierten una sola vez a días enteros (desde 1970-01-01); la clave de
+cada granularidad sale de esos días con aritmética entera y las sumas con bincount.
+El texto de las etiquetas solo se arma para los períodos resultantes, no por fila.
+
+Es la única conversión fecha -> entero del proyecto: clientes, cohortes, distintos y
+agregados usan estos días y esta clave de mes (meses desde 1970-01). También ubica las
+filas en las rejillas día x categoría de los acumulados (agregados.py) y de los índices
+de distintos (distintos.py), incluido qué se puede reusar en la ingesta incremental.
+
+@author: elias
+"""
+
+import numpy as np
+import pandas as pd
+
+# Opciones del selector -> granularidad
+GRANULARIDADES = {
+    "Día": "dia",
+    "Semana": "semana",
+    "Mes": "mes",
+    "Trimestre": "trimestre",
+    "Año": "anio",
+}
+
+TITULOS = {
+    "dia": "Evolución Diaria de Ventas",
+    "semana": "Evolución Semanal de Ventas",
+    "mes": "Evolución Mensual de Ventas",
+    "trimestre": "Evolución Trimestral de Ventas",
+    "anio": "Evolución Anual de Ventas",
+}
+
+# 1970-01-01 fue jueves: con este corrimiento las semanas empiezan en lunes
+_CORRIMIENTO_SEMANA = 3
+
+
+def dias_desde_fechas(fechas):
+    # Fechas (datetime64, Timestamp o texto; sueltas o en arreglo) -> días enteros desde 1970-01-01
+    return np.asarray(fechas, dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int32)
+
+
+def _meses(dias):
+    # Días -> meses desde 1970-01 (conversión de unidades de numpy, sin pasar por texto)
+    return np.asarray(dias).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def meses_desde_aaaamm(aaaamm):
+    # Columna `mes` de los hechos (AAAAMM) -> misma clave que claves_periodo(dias, "mes")
+    aaaamm = np.asarray(aaaamm, dtype=np.int64)
+    return (aaaamm // 100 - 1970) * 12 + aaaamm % 100 - 1
+
+
+def claves_periodo(dias, granularidad):
+    # Número entero del período de cada día; períodos consecutivos difieren en 1
+    dias = np.asarray(dias, dtype=np.int64)
+    if granularidad == "dia":
+        return dias
+    if granularidad == "semana":
+        return (dias + _CORRIMIENTO_SEMANA) // 7
+    if granularidad == "mes":
+        return _meses(dias)
+    if granularidad == "trimestre":
+        return _meses(dias) // 3
+    if granularidad == "anio":
+        return _meses(dias) // 12
+    raise ValueError(f"Granularidad no soportada: {granularidad}")
+
+
+def etiquetas_periodo(claves, granularidad):
+    # Claves de período -> etiquetas para ejes y reportes (día y semana: fecha de inicio)
+    claves = np.asarray(claves, dtype=np.int64)
+    if granularidad == "dia":
+        etiquetas = claves.astype("datetime64[D]").astype(str)
+    elif granularidad == "semana":
+        etiquetas = (claves * 7 - _CORRIMIENTO_SEMANA).astype("datetime64[D]").astype(str)
+    elif granularidad == "mes":
+        etiquetas = [f"{1970 + mes // 12}-{mes % 12 + 1:02d}" for mes in claves]
+    elif granularidad == "trimestre":
+        etiquetas = [f"{1970 + trimestre // 4}-T{trimestre % 4 + 1}" for trimestre in claves]
+    elif granularidad == "anio":
+        etiquetas = [str(1970 + anio) for anio in claves]
+    else:
+        raise ValueError(f"Granularidad no soportada: {granularidad}")
+    return pd.Index(etiquetas, name=granularidad)
+
+
+def rango_dias(inicio, num_dias, fecha_ini, fecha_fin):
+    # Días [i, j) contados desde `inicio` que cubren [fecha_ini, fecha_fin], dentro de 0..num_dias
+    origen = int(dias_desde_fechas(inicio))
+    i = min(max(int(dias_desde_fechas(fecha_ini)) - origen, 0), num_dias)
+    j = min(max(int(dias_desde_fechas(fecha_fin)) - origen + 1, i), num_dias)
+    return i, j
+
+
+def rejilla_dia_categoria(tabla, previo=None, desde=None):
+    # Ubica las filas de `tabla` (order_date y category_id, ordenada por fecha) en una rejilla
+    # día x categoría con origen en su primer día. Con `previo` y `desde` (ingesta incremental)
+    # se reusan el origen y las categorías de `previo` si lo nuevo entra en ellos, y solo se
+    # ubican las filas desde el día `k` (el de `desde`); si no, `incremental` es False y se
+    # ubican todas las filas.
+    inicio = tabla["order_date"].min()
+    categoria_ids = np.sort(tabla["category_id"].unique())
+    incremental = (
+        previo is not None and desde is not None and desde >= previo["inicio"]
+        and np.isin(categoria_ids, previo["categoria_ids"]).all()
+    )
+    if incremental:
+        inicio, categoria_ids = previo["inicio"], previo["categoria_ids"]
+    origen = int(dias_desde_fechas(inicio))
+    k = int(dias_desde_fechas(desde)) - origen if incremental else 0
+
+    cola = tabla.iloc[tabla["order_date"].searchsorted(inicio + pd.Timedelta(days=k)):]
+    return {
+        "incremental": incremental,
+        "inicio": inicio,
+        "categoria_ids": categoria_ids,
+        "num_dias": int(dias_desde_fechas(tabla["order_date"].max())) - origen + 1,
+        "k": k,
+        "cola": cola,
+        # Fila (posición de la categoría) y día (desde `inicio`) de cada fila de la cola
+        "fila": np.searchsorted(categoria_ids, cola["category_id"].to_numpy()),
+        "dia": dias_desde_fechas(cola["order_date"]) - origen,
+    }
+
+
+def ventas_por_periodo(ventas_diarias, granularidad):
+    # `ventas_diarias`: ventas indexadas por día entero, ordenadas y solo días con ventas.
+    # Suma por período; quedan los períodos con al menos un día con ventas.
+    if ventas_diarias.empty:
+        return pd.Series(dtype=float, index=pd.Index([], name=granularidad), name="total")
+    claves = claves_periodo(ventas_diarias.index.to_numpy(), granularidad)
+    posicion = claves - claves[0]
+    sumas = np.bincount(posicion, weights=ventas_diarias.to_numpy(dtype=np.float64))
+    con_ventas = np.flatnonzero(np.bincount(posicion))
+    return pd.Series(
+        sumas[con_ventas], index=etiquetas_periodo(claves[0] + con_ventas, granularidad), name="total"
+    )
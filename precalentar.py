@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Precalentamiento de los caches antes de que el servidor acepte sesiones.
+
+Construye en el mismo proceso del servidor las tablas, la tabla de hechos, los
+agregados del estado inicial de los filtros (todo el rango de fechas y todas las
+categorías) y los gráficos por defecto; luego arranca Streamlit, que encuentra
+los caches ya llenos. El servidor (y su health check) recién escucha al terminar.
+
+Uso:
+    python precalentar.py app.py --server.port 8501
+
+@author: elias
+"""
+
+import os
+import sys
+import time
+
+from streamlit.logger import set_log_level
+
+from datos import CARPETA_DATOS, version_datos, load_data, construir_hechos
+from agregados import calcular_resultados, nombres_dimensiones
+from distintos import calcular_conteos
+from ingesta import obtener_almacen
+from motor_sql import MOTOR_DATOS, obtener_motor_sql
+from cache_resultados import obtener_cache_resultados, clave_filtros
+from inventario import (
+    VENTANA_DIAS, DIAS_RIESGO, construir_inventario, version_inventario, ventana_ventas, ventas_desde_hechos,
+    evaluar_inventario,
+)
+from reportes import REPORTES
+from ranking import TOP_PRODUCTOS, top_k
+from clientes import version_clientes, pedidos_desde_hechos, construir_base_clientes, calcular_rfm
+from graficos import (
+    grafico_ventas_categoria, grafico_ventas_mensuales, grafico_top_productos, grafico_top_vendedores,
+    grafico_ventas_segmento,
+)
+
+SCRIPT_POR_DEFECTO = "app.py"
+
+
+# ============================================
+# ETAPAS
+# ============================================
+# Los caches de Streamlit arman la clave con los argumentos tal como se pasan (sin los
+# valores por defecto): cada función cacheada se llama igual que en los dashboards.
+def _medir(tiempos, nombre, funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    tiempos[nombre] = time.perf_counter() - inicio
+    print(f"  {nombre:<20} {tiempos[nombre] * 1000:>10.1f} ms")
+    return resultado
+
+
+def _estado_inicial():
+    # Mismos valores por defecto que la barra lateral de app.py y las funciones con que
+    # cada sección calcula sus resultados
+    if MOTOR_DATOS == "pandas":
+        estado = obtener_almacen().actualizar()
+        hechos = estado["hechos"]
+        categorias = list(hechos["category_name"].unique())
+        nombres_categorias = estado["nombres"]["categorias"]
+        ids = nombres_categorias.index[nombres_categorias.isin(categorias)]
+        fecha_ini, fecha_fin = hechos["order_date"].min().date(), hechos["order_date"].max().date()
+        calculos = {
+            "series": lambda: calcular_resultados(
+                estado["cubo"], estado["acumulados"], estado["nombres"], ids, fecha_ini, fecha_fin
+            ),
+            "conteos": lambda: calcular_conteos(estado["indices_distintos"], ids, fecha_ini, fecha_fin, False),
+            "ventas": lambda inicio, fin: ventas_desde_hechos(hechos, inicio, fin),
+            "pedidos": lambda: pedidos_desde_hechos(hechos),
+        }
+    else:
+        motor = obtener_motor_sql(MOTOR_DATOS)
+        estado = motor.actualizar()
+        categorias = list(estado["categorias"].to_numpy())
+        ids = estado["categorias"].index
+        fecha_ini, fecha_fin = estado["fecha_min"].date(), estado["fecha_max"].date()
+        calculos = {
+            "series": lambda: motor.resultados(ids, fecha_ini, fecha_fin),
+            "conteos": lambda: motor.conteos(ids, fecha_ini, fecha_fin, False),
+            "ventas": motor.ventas_tienda_producto,
+            "pedidos": motor.pedidos_clientes,
+        }
+    return estado["version"], categorias, ids, fecha_ini, fecha_fin, calculos
+
+
+def _graficos(resultados):
+    # Los mismos gráficos (y recortes) que dibujan las secciones de ventas con los filtros por defecto
+    imagenes = []
+    if not resultados["ventas_categoria"].empty:
+        imagenes.append(grafico_ventas_categoria(resultados["ventas_categoria"]))
+    if not resultados["ventas_mensuales"].empty:
+        imagenes.append(grafico_ventas_mensuales(resultados["ventas_mensuales"]))
+    top_prod = top_k(resultados["ventas_productos"], TOP_PRODUCTOS, 0)
+    if not top_prod.empty:
+        imagenes.append(grafico_top_productos(top_prod))
+    if not resultados["ventas_vendedores"].empty:
+        imagenes.append(grafico_top_vendedores(resultados["ventas_vendedores"]))
+    return imagenes
+
+
+def precalentar_app():
+    # app.py: almacén (o motor SQL), agregados y conteos del filtro inicial, sus gráficos,
+    # la cobertura de inventario con la ventana por defecto y la segmentación de clientes
+    tiempos = {}
+    version, categorias, ids, fecha_ini, fecha_fin, calculos = _medir(tiempos, "carga_datos", _estado_inicial)
+    cache = obtener_cache_resultados()
+    resultados = _medir(
+        tiempos, "agregaciones", cache.obtener,
+        clave_filtros("series", version, categorias, fecha_ini, fecha_fin), calculos["series"],
+    )
+    _medir(
+        tiempos, "conteos", cache.obtener,
+        clave_filtros("conteos", version, categorias, fecha_ini, fecha_fin, False), calculos["conteos"],
+    )
+    _medir(tiempos, "graficos", _graficos, resultados)
+
+    version_stock = (version, version_inventario())
+    inventario = _medir(tiempos, "matriz_stock", lambda: construir_inventario(version=version_stock))
+    ventana_ini, ventana_fin, dias = ventana_ventas(fecha_fin, VENTANA_DIAS, fecha_ini)
+    _medir(
+        tiempos, "inventario", cache.obtener,
+        clave_filtros("inventario", version_stock, categorias, ventana_ini, ventana_fin, DIAS_RIESGO),
+        lambda: evaluar_inventario(inventario, calculos["ventas"](ventana_ini, ventana_fin), dias, ids, DIAS_RIESGO),
+    )
+
+    version_rfm = (version, version_clientes())
+    base = _medir(tiempos, "base_clientes", construir_base_clientes, calculos["pedidos"], version_rfm)
+    rfm = _medir(
+        tiempos, "rfm", cache.obtener,
+        clave_filtros("rfm", version_rfm, categorias, fecha_ini, fecha_fin),
+        lambda: calcular_rfm(base, ids, fecha_ini, fecha_fin),
+    )
+    if not rfm["segmentos"].empty:
+        _medir(tiempos, "grafico_segmentos", grafico_ventas_segmento, rfm["segmentos"]["Ventas"])
+    return tiempos
+
+
+def precalentar_dashboard():
+    # dashboard_bikestore.py: nodos del grafo de reportes (tablas, insumos compartidos y reportes)
+    tiempos = {}
+    reportes = REPORTES.evaluador(version_datos())
+    for nombre in ("kpis", "ventas_categoria", "ventas_diarias", "top_productos", "ventas_vendedores"):
+        _medir(tiempos, nombre, reportes.__getitem__, nombre)
+    return tiempos
+
+
+def precalentar_tablas():
+    # app2.py: tablas compartidas, tabla de hechos y códigos de nombre de los rankings
+    tiempos = {}
+    version = version_datos()
+    _medir(tiempos, "load_data", lambda: load_data(version=version))
+    _medir(tiempos, "construir_hechos", lambda: construir_hechos(version=version))
+    _medir(tiempos, "nombres", lambda: nombres_dimensiones(version=version))
+    return tiempos
+
+
+PRECALENTADORES = {
+    "app.py": precalentar_app,
+    "app2.py": precalentar_tablas,
+    "dashboard_bikestore.py": precalentar_dashboard,
+}
+
+
+def precalentar(script=SCRIPT_POR_DEFECTO):
+    # Devuelve los segundos por etapa (y el total) del precalentamiento del script
+    print(f"Precalentando caches de {script} (datos en {CARPETA_DATOS})")
+    inicio = time.perf_counter()
+    tiempos = PRECALENTADORES.get(os.path.basename(script), precalentar_tablas)()
+    tiempos["total"] = time.perf_counter() - inicio
+    print(f"Precalentamiento completo en {tiempos['total']:.2f} s")
+    return tiempos
+
+
+if __name__ == "__main__":
+    # Sin servidor todavía, los caches avisan en cada llamada; al arrancar Streamlit
+    # vuelve a aplicar el nivel de log de su configuración
+    set_log_level("error")
+    argumentos = sys.argv[1:]
+    script = argumentos.pop(0) if argumentos and argumentos[0].endswith(".py") else SCRIPT_POR_DEFECTO
+    precalentar(script)
+
+    # Mismo proceso: los st.cache_resource llenos arriba son los que usará el servidor
+    from streamlit.web import cli
+    sys.argv = ["streamlit", "run", script, *argumentos]
+    sys.exit(cli.main())
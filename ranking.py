@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Rankings (top K) de productos y vendedores sobre ids enteros.
+
+Las ventas se suman por código de nombre con bincount (los productos con nombres
+repetidos comparten código), el umbral se aplica sobre el arreglo de sumas y los K
+mayores se eligen con selección parcial (argpartition), sin ordenar todo. Los nombres
+solo se leen para los K elegidos.
+
+@author: elias
+"""
+
+import numpy as np
+import pandas as pd
+
+# Tamaño de los rankings de los gráficos
+TOP_PRODUCTOS = 10
+TOP_VENDEDORES = 8
+
+
+def codigos_nombres(nombres):
+    # `nombres`: serie id -> nombre. Una vez por versión de los datos: ids ordenados,
+    # código de nombre de cada id y nombres distintos (posición = código)
+    orden = np.argsort(nombres.index.to_numpy(), kind="stable")
+    codigos, distintos = pd.factorize(nombres.to_numpy()[orden])
+    return {
+        "ids": nombres.index.to_numpy()[orden],
+        "codigos": codigos.astype(np.int32),
+        "nombres": np.asarray(distintos, dtype=object),
+        "nombre": nombres.name,
+    }
+
+
+def sumar_por_nombre(codigos, ids, valores):
+    # Suma de `valores` por código de nombre (ids desconocidos se ignoran). `con_ventas`
+    # distingue los nombres sin filas de los que suman cero.
+    ids = np.asarray(ids)
+    posicion = np.minimum(np.searchsorted(codigos["ids"], ids), max(len(codigos["ids"]) - 1, 0))
+    conocidos = codigos["ids"][posicion] == ids
+    codigo = codigos["codigos"][posicion[conocidos]]
+    n = len(codigos["nombres"])
+    return {
+        "ventas": np.bincount(codigo, weights=np.asarray(valores, dtype=np.float64)[conocidos], minlength=n),
+        "con_ventas": np.bincount(codigo, minlength=n) > 0,
+        "nombres": codigos["nombres"],
+        "nombre": codigos["nombre"],
+    }
+
+
+def top_k(ranking, k, minimo=None):
+    # Los `k` nombres con más ventas (y al menos `minimo`), de mayor a menor
+    ventas = ranking["ventas"]
+    candidatos = ranking["con_ventas"] if minimo is None else ranking["con_ventas"] & (ventas >= minimo)
+    candidatos = np.flatnonzero(candidatos)
+    k = min(k, len(candidatos))
+    if k < len(candidatos):
+        candidatos = candidatos[np.argpartition(-ventas[candidatos], k - 1)[:k]]
+    elegidos = candidatos[np.argsort(-ventas[candidatos], kind="stable")]
+    return pd.Series(
+        ventas[elegidos], index=pd.Index(ranking["nombres"][elegidos], name=ranking["nombre"]), name="total"
+    )
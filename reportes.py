@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Grafo declarativo y perezoso de los reportes de dashboard_bikestore.py.
+
+Cada nodo es una función cuyos parámetros nombran los nodos de los que depende.
+Un nodo se calcula solo cuando algún reporte en pantalla lo necesita, una vez por
+versión de los datos, y su resultado se comparte entre reportes y sesiones.
+
+@author: elias
+"""
+
+import inspect
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from datos import VERSIONES_EN_MEMORIA, load_data, congelar
+from periodos import dias_desde_fechas
+from ranking import TOP_PRODUCTOS, codigos_nombres, sumar_por_nombre, top_k
+
+
+class GrafoReportes:
+    # Nodos nombre -> (función, dependencias) con memo por versión de los datos.
+    # El parámetro especial `version` recibe la versión que se está evaluando.
+
+    def __init__(self, versiones=VERSIONES_EN_MEMORIA):
+        self.versiones = versiones
+        self.aciertos = 0
+        self.fallos = 0
+        self._nodos = {}
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def nodo(self, funcion):
+        # Decorador: el nombre del nodo es el de la función y sus dependencias, sus parámetros
+        dependencias = list(inspect.signature(funcion).parameters)
+        faltantes = [dep for dep in dependencias if dep != "version" and dep not in self._nodos]
+        if faltantes:
+            raise ValueError(f"El nodo {funcion.__name__} depende de nodos no definidos: {faltantes}")
+        self._nodos[funcion.__name__] = (funcion, dependencias)
+        return funcion
+
+    def _memo_version(self, version):
+        # Memo de la versión (se descartan las versiones más antiguas)
+        if version not in self._memo:
+            self._memo[version] = {}
+            while len(self._memo) > self.versiones:
+                self._memo.popitem(last=False)
+        self._memo.move_to_end(version)
+        return self._memo[version]
+
+    def evaluar(self, nombre, version):
+        with self._lock:
+            memo = self._memo_version(version)
+            if nombre in memo:
+                self.aciertos += 1
+                return memo[nombre]
+            self.fallos += 1
+
+        # Se calcula fuera del lock para no bloquear a otras sesiones
+        funcion, dependencias = self._nodos[nombre]
+        argumentos = {
+            dep: version if dep == "version" else self.evaluar(dep, version) for dep in dependencias
+        }
+        valor = congelar(funcion(**argumentos))
+
+        with self._lock:
+            return memo.setdefault(nombre, valor)
+
+    def evaluador(self, version):
+        # Acceso perezoso por nombre para una versión: reportes = grafo.evaluador(v); reportes["x"]
+        return _Evaluador(self, version)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "nodos": len(self._nodos),
+                "calculados": sum(len(memo) for memo in self._memo.values()),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+            }
+
+
+class _Evaluador:
+    def __init__(self, grafo, version):
+        self.grafo = grafo
+        self.version = version
+
+    def __getitem__(self, nombre):
+        return self.grafo.evaluar(nombre, self.version)
+
+
+# ============================================
+# REPORTES DE dashboard_bikestore.py
+# ============================================
+REPORTES = GrafoReportes()
+
+
+@REPORTES.nodo
+def tablas(version):
+    return load_data(version=version)
+
+
+@REPORTES.nodo
+def lineas(tablas):
+    # Líneas de pedido con su importe: la fórmula del total se evalúa una sola vez
+    order_items = tablas[1]
+    return pd.DataFrame({
+        "order_id": order_items["order_id"],
+        "product_id": order_items["product_id"],
+        "total": order_items["quantity"] * order_items["list_price_order"] * (1 - order_items["discount"]),
+    })
+
+
+@REPORTES.nodo
+def lineas_productos(tablas, lineas):
+    # Líneas con la categoría de su producto (ventas por categoría y top productos)
+    products, _, _, categories, _ = tablas
+    return (
+        lineas
+        .merge(products[["product_id", "category_id"]], on="product_id")
+        .merge(categories[["category_id", "category_name"]], on="category_id")
+    )
+
+
+@REPORTES.nodo
+def lineas_ordenes(tablas, lineas):
+    # Líneas con fecha y vendedor de su orden (ventas mensuales y por vendedor)
+    orders = tablas[2]
+    return lineas.merge(orders[["order_id", "order_date", "staff_id"]], on="order_id")
+
+
+@REPORTES.nodo
+def kpis(tablas, lineas):
+    products, _, orders, _, _ = tablas
+    return {
+        "ventas_totales": float(lineas["total"].sum()),
+        "num_ordenes": int(orders["order_id"].nunique()),
+        "num_productos": int(products["product_id"].nunique()),
+    }
+
+
+@REPORTES.nodo
+def ventas_categoria(lineas_productos):
+    return lineas_productos.groupby("category_name", observed=True)["total"].sum().sort_values(ascending=False)
+
+
+@REPORTES.nodo
+def ventas_diarias(lineas_ordenes):
+    # Ventas por día entero (solo días con ventas): cada granularidad se agrega desde aquí
+    dias = dias_desde_fechas(pd.to_datetime(lineas_ordenes["order_date"]))
+    primero = int(dias.min()) if len(dias) else 0
+    ventas = np.bincount(dias - primero, weights=lineas_ordenes["total"].to_numpy(dtype=np.float64))
+    con_ventas = np.flatnonzero(np.bincount(dias - primero))
+    return pd.Series(ventas[con_ventas], index=pd.Index(primero + con_ventas, name="dia"), name="total")
+
+
+@REPORTES.nodo
+def codigos_productos(tablas):
+    products = tablas[0]
+    return codigos_nombres(pd.Series(
+        products["product_name"].astype(str).to_numpy(), index=products["product_id"].to_numpy(), name="product_name"
+    ))
+
+
+@REPORTES.nodo
+def top_productos(lineas_productos, codigos_productos):
+    # Sumas por código de nombre y selección parcial: solo los elegidos llevan nombre
+    ventas = sumar_por_nombre(codigos_productos, lineas_productos["product_id"], lineas_productos["total"])
+    return top_k(ventas, TOP_PRODUCTOS)
+
+
+@REPORTES.nodo
+def ventas_vendedores(tablas, lineas_ordenes):
+    staffs = tablas[4]
+    return (
+        lineas_ordenes.merge(staffs[["staff_id", "first_name"]], on="staff_id")
+        .groupby("first_name", observed=True)["total"].sum()
+        .sort_values(ascending=False)
+    )
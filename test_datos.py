@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Las tablas compartidas (TablaSoloLectura) no se pueden modificar por ninguna vía y un
+snapshot dañado se regenera desde el CSV.
+
+@author: elias
+"""
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from datos import CARPETA_SNAPSHOT, congelar, leer_tabla
+
+BLOQUEADAS = {
+    "setitem": lambda t: t.__setitem__("c", 1),
+    "delitem": lambda t: t.__delitem__("a"),
+    "insert": lambda t: t.insert(0, "c", 1),
+    "columns": lambda t: setattr(t, "columns", ["x", "y"]),
+    "index": lambda t: setattr(t, "index", [7, 8, 9]),
+    "set_axis_nocheck": lambda t: t._set_axis_nocheck(["x", "y"], 1, True),
+    "rename": lambda t: t.rename(columns={"a": "z"}, index={0: 9}, inplace=True),
+    "set_index": lambda t: t.set_index("a", inplace=True),
+    "reset_index": lambda t: t.reset_index(drop=True, inplace=True),
+    "fillna": lambda t: t.fillna(0, inplace=True),
+    "sort_values": lambda t: t.sort_values("a", inplace=True),
+    "drop": lambda t: t.drop(columns="b", inplace=True),
+    "dropna": lambda t: t.dropna(inplace=True),
+    "update": lambda t: t.update(pd.DataFrame({"a": [0, 0, 0]})),
+    "iloc": lambda t: t.iloc.__setitem__((0, 0), 99),
+    "loc_fila_nueva": lambda t: t.loc.__setitem__(40, [4, 4.0]),
+    "loc_columna_nueva": lambda t: t.loc.__setitem__((10, "c"), 1),
+    "isetitem": lambda t: t.isetitem(0, [0, 0, 0]),
+    "index_name": lambda t: setattr(t.index, "name", "x"),
+    "columns_name": lambda t: setattr(t.columns, "name", "x"),
+}
+
+
+def _tabla():
+    return pd.DataFrame({"a": [3, 1, 2], "b": [1.0, np.nan, 2.0]}, index=[10, 20, 30])
+
+
+@pytest.mark.parametrize("nombre", list(BLOQUEADAS))
+def test_modificacion_bloqueada_sin_cambios(nombre):
+    tabla = congelar(_tabla())
+    with pytest.raises((TypeError, ValueError, RuntimeError)):
+        BLOQUEADAS[nombre](tabla)
+    pd.testing.assert_frame_equal(tabla, _tabla(), check_frame_type=False)
+
+
+def test_derivadas_son_modificables():
+    tabla = congelar(_tabla())
+    copia = tabla.rename(columns={"a": "z"}).set_axis(["x", "y"], axis=1).sort_values("x")
+    copia.columns = ["p", "q"]
+    copia["r"] = 1
+    assert type(copia) is pd.DataFrame
+    pd.testing.assert_frame_equal(tabla, _tabla(), check_frame_type=False)
+
+
+@pytest.mark.parametrize("contenido", [None, b"", b"PK\x03\x04 truncado"])
+def test_snapshot_danado_se_regenera(tmp_path, contenido):
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "categories.csv"), tmp_path)
+    esperada = leer_tabla("categories", str(tmp_path))
+    ruta = tmp_path / CARPETA_SNAPSHOT / "categories.npz"
+    # None: snapshot truncado a la mitad; si no, reemplazado por `contenido`
+    if contenido is None:
+        os.truncate(ruta, os.path.getsize(ruta) // 2)
+    else:
+        ruta.write_bytes(contenido)
+    pd.testing.assert_frame_equal(leer_tabla("categories", str(tmp_path)), esperada)
+    pd.testing.assert_frame_equal(leer_tabla("categories", str(tmp_path)), esperada)
+    assert os.listdir(ruta.parent) == ["categories.npz"]
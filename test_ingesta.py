@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+La ingesta incremental de AlmacenDatos deja el mismo estado que una carga completa.
+
+@author: elias
+"""
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cohortes import cohortes_desde_hechos
+from datos import leer_tablas, unir_hechos
+from ingesta import AlmacenDatos
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+
+
+def _filas(nombre):
+    # Encabezado y filas (sin salto de línea) del CSV de ejemplo
+    with open(os.path.join(CARPETA, f"{nombre}.csv"), "rb") as archivo:
+        lineas = [linea.rstrip(b"\r\n") for linea in archivo]
+    return lineas[0], [linea for linea in lineas[1:] if linea]
+
+
+def _order_id(fila):
+    return int(fila.split(b",")[0])
+
+
+def _escribir(ruta, texto):
+    # Agrega al final y fuerza un mtime distinto para que cambie la versión de los datos
+    with open(ruta, "ab") as archivo:
+        archivo.write(texto)
+    info = os.stat(ruta)
+    os.utime(ruta, ns=(info.st_atime_ns, info.st_mtime_ns + 1_000_000))
+
+
+@pytest.fixture
+def carpeta(tmp_path):
+    for nombre in ("products", "categories", "staffs"):
+        shutil.copy(os.path.join(CARPETA, f"{nombre}.csv"), tmp_path)
+    return tmp_path
+
+
+def _comparar_con_carga_completa(almacen, carpeta):
+    estado = almacen.estado
+    hechos = unir_hechos(*leer_tablas(str(carpeta)))
+    pd.testing.assert_frame_equal(estado["hechos"], hechos, check_categorical=False, check_frame_type=False)
+    esperadas = cohortes_desde_hechos(hechos)
+    for clave in ("clientes", "ventas", "primer_mes"):
+        assert np.allclose(estado["cohortes"][clave], esperadas[clave]), clave
+
+
+def test_lineas_de_una_orden_en_dos_ingestas(carpeta):
+    encabezado_o, orders = _filas("orders")
+    encabezado_i, items = _filas("order_items")
+    corte = 1200
+    # La orden `corte + 1` llega con su primera línea; el resto de sus líneas, en la ingesta siguiente
+    partida = [fila for fila in items if _order_id(fila) == corte + 1]
+    assert len(partida) > 1
+
+    _escribir(carpeta / "orders.csv", b"\n".join([encabezado_o] + [f for f in orders if _order_id(f) <= corte]) + b"\n")
+    _escribir(carpeta / "order_items.csv", b"\n".join([encabezado_i] + [f for f in items if _order_id(f) <= corte]) + b"\n")
+    almacen = AlmacenDatos(str(carpeta))
+
+    _escribir(carpeta / "orders.csv", b"\n".join(f for f in orders if _order_id(f) > corte) + b"\n")
+    _escribir(carpeta / "order_items.csv", partida[0] + b"\n")
+    almacen.actualizar()
+    _escribir(carpeta / "order_items.csv", b"\n".join(f for f in items if _order_id(f) > corte and f != partida[0]) + b"\n")
+    almacen.actualizar()
+
+    assert almacen.ultima_ingesta["modo"] == "incremental"
+    _comparar_con_carga_completa(almacen, carpeta)
+
+
+def test_csv_sin_salto_de_linea_final(carpeta):
+    # Escritores que separan las filas con el salto de línea antes de cada fila nueva
+    encabezado_o, orders = _filas("orders")
+    encabezado_i, items = _filas("order_items")
+    corte = 1200
+    _escribir(carpeta / "orders.csv", b"\n".join([encabezado_o] + [f for f in orders if _order_id(f) <= corte]))
+    _escribir(carpeta / "order_items.csv", b"\n".join([encabezado_i] + [f for f in items if _order_id(f) <= corte]))
+    almacen = AlmacenDatos(str(carpeta))
+
+    for desde, hasta in ((corte, corte + 100), (corte + 100, None)):
+        tramo = lambda filas: [f for f in filas if desde < _order_id(f) and (hasta is None or _order_id(f) <= hasta)]
+        _escribir(carpeta / "orders.csv", b"".join(b"\n" + f for f in tramo(orders)))
+        _escribir(carpeta / "order_items.csv", b"".join(b"\n" + f for f in tramo(items)))
+        almacen.actualizar()
+        assert almacen.ultima_ingesta["modo"] == "incremental"
+        _comparar_con_carga_completa(almacen, carpeta)